@@ -0,0 +1,109 @@
+"""
+Script: conftest.py
+Purpose: Shared setup for the pytest-benchmark suites in this directory.
+This covers import paths, synthetic spill and MISLE data, and the SQLite
+`stream_buffer` stand-in. None of it needs PostgreSQL.
+
+--bench-rows sets the synthetic spill data sizes (default 10k and 1M):
+    python -m pytest benchmarks --bench-rows 10000
+"""
+
+import os
+import sqlite3
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "rl_env"))
+sys.path.append(os.path.join(ROOT, "data_integration"))
+
+ROWS = (10_000, 1_000_000)
+
+
+def pytest_addoption(parser):
+    parser.addoption("--bench-rows", type=int, nargs="+", default=list(ROWS),
+                     help="synthetic spill data sizes for the ingest/label benchmarks")
+
+
+def pytest_generate_tests(metafunc):
+    if "rows" in metafunc.fixturenames:
+        rows = metafunc.config.getoption("bench_rows", default=list(ROWS))
+        metafunc.parametrize("rows", rows, ids=[f"{n}_rows" for n in rows], scope="module")
+
+
+# --- SYNTHETIC DATA ---
+def synthetic_spills(n, seed=0):
+    """Spill incident rows with the source CSV's headers and a realistic mix of rule hits."""
+    rng = np.random.default_rng(seed)
+    spill = pd.Timestamp("2015-01-01") + pd.to_timedelta(rng.integers(0, 3000, n), unit="D")
+    close = spill + pd.to_timedelta(rng.integers(-5, 90, n), unit="D")
+    quantity = rng.gamma(2.0, 500.0, n).round(1)
+    return pd.DataFrame({
+        "Spill Number": np.arange(1, n + 1),
+        "Program Facility Name": "FAC",
+        "Street 1": "1 Main St",
+        "Locality": "X",
+        "County": "Y",
+        "ZIP Code": np.where(rng.random(n) < 0.05, None, "12345"),
+        "SWIS Code": rng.integers(100, 999, n).astype(float),
+        "DEC Region": rng.integers(1, 10, n),
+        "Spill Date": spill.strftime("%m/%d/%Y"),
+        "Received Date": spill.strftime("%m/%d/%Y"),
+        "Contributing Factor": "Unknown",
+        "Waterbody": None,
+        "Source": "Tank",
+        "Material Name": rng.choice(["diesel", "gasoline", "unknown petroleum"], n),
+        "Material Family": "Petroleum",
+        "Quantity": np.where(rng.random(n) < 0.1, np.nan, quantity),
+        "Units": "Gallons",
+        "Recovered": (quantity * rng.uniform(0, 1.2, n)).round(1),
+        "Close Date": close.strftime("%m/%d/%Y"),
+    })
+
+
+def synthetic_descriptions(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = np.array("vessel grounding oil sheen reported harbor tank leak diesel barge collision "
+                     "pollution response crew recovered boom deployed fuel spill river dock pier".split())
+    lengths = rng.integers(5, 30, n)
+    return pd.DataFrame({
+        "activity_id": np.arange(n),
+        "description_clean": [" ".join(rng.choice(vocab, k)) for k in lengths],
+    })
+
+
+# --- FIXTURES ---
+@pytest.fixture(scope="session")
+def anomaly_flags():
+    return np.random.default_rng(0).random(100_000) < 0.3
+
+
+@pytest.fixture(scope="session")
+def sqlite_stream_buffer(anomaly_flags, tmp_path_factory):
+    """URL of a SQLite snapshot of `stream_buffer`, as written by storage_backends.export_snapshot."""
+    path = str(tmp_path_factory.mktemp("storage") / "stream_buffer.sqlite")
+    conn = sqlite3.connect(path)
+    pd.DataFrame({"spill_anomaly_flag": anomaly_flags.astype(int)}).to_sql("stream_buffer", conn, index=False)
+    conn.commit()
+    conn.close()
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture(scope="module")
+def spill_csv(rows, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("spills") / f"spills_{rows}.csv")
+    synthetic_spills(rows).to_csv(path, index=False)
+    return path
+
+
+@pytest.fixture(scope="module")
+def spill_frame(rows):
+    return synthetic_spills(rows)
+
+
+@pytest.fixture(scope="session")
+def descriptions():
+    return synthetic_descriptions(200_000)
@@ -0,0 +1,177 @@
+"""
+Script: test_hot_paths.py
+Purpose: pytest-benchmark suites for the hot paths. None of them need PostgreSQL.
+
+- env:     RealisticDatabaseHealingEnvV3 reset/step with `stream_buffer` served
+           from a SQLite snapshot (storage_backends.SQLiteStorage) or from memory,
+           plus the batched simulator.
+- ingest:  the CPU side of preprocess_spill. This streams CSV chunks, normalizes
+           them and renders the COPY buffer, on synthetic spill data.
+- label:   LABEL_RULES evaluated on the same synthetic data.
+- detect:  detect_misle_anomalies fit and batch scoring on synthetic descriptions.
+- predict: single-observation DQN predict latency, for SB3 and the exported NumPy policy.
+
+Results are stored as JSON by pytest-benchmark; compare every change against a baseline:
+    python -m pytest benchmarks --benchmark-json=baseline.json
+    python -m pytest benchmarks --benchmark-autosave
+    python -m pytest benchmarks --benchmark-compare --benchmark-compare-fail=median:10%
+    python -m pytest benchmarks -k "env or predict" --bench-rows 10000
+
+Throughput benchmarks record their unit of work in `extra_info` (rows, steps, obs),
+so rates are `extra_info` / the reported time.
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(ROOT, "rl_env", "dqn_self_healing_model_realistic_v3.zip")
+HEAVY_ROUNDS = 3  # single-shot rounds for the multi-second benchmarks
+
+
+# --- ENV ---
+@pytest.fixture(params=["sqlite", "memory"])
+def env(request, anomaly_flags, sqlite_stream_buffer):
+    from database_healing_env_realistic_v3 import RealisticDatabaseHealingEnvV3
+    from episode_sampler import EpisodeSampler
+
+    if request.param == "sqlite":
+        env = RealisticDatabaseHealingEnvV3(storage=sqlite_stream_buffer)
+    else:
+        env = RealisticDatabaseHealingEnvV3(sampler=EpisodeSampler.from_flags(anomaly_flags, seed=0))
+    env.reset(seed=0)
+    env.action_space.seed(0)
+    yield env
+    env.close()
+
+
+def test_env_reset(benchmark, env):
+    benchmark(env.reset)
+
+
+def test_env_step(benchmark, env):
+    def step():
+        _, _, terminated, truncated, _ = env.step(env.action_space.sample())
+        if terminated or truncated:
+            env.reset()
+
+    benchmark(step)
+
+
+def test_env_vec64_step(benchmark, anomaly_flags):
+    from healing_simulator import BatchedHealingSimulator
+
+    sim = BatchedHealingSimulator(64, anomaly_flags=anomaly_flags, seed=0)
+    sim.reset()
+    actions = np.random.default_rng(0).integers(0, 5, 64)
+    benchmark.extra_info["steps"] = actions.size
+    benchmark(sim.step, actions)
+    sim.close()
+
+
+# --- INGEST ---
+def test_ingest_spill_csv(benchmark, rows, spill_csv):
+    from bulk_loader import _to_copy_buffer
+    from stream_ingest import iter_csv_chunks, normalize_chunk
+
+    date_cols = ["spill_date", "received_date", "close_date"]
+    column_types = None
+
+    def ingest():
+        nonlocal column_types
+        for chunk in iter_csv_chunks(spill_csv):
+            chunk = normalize_chunk(chunk, date_cols=date_cols)
+            if column_types is None:
+                column_types = {c: "bigint" if c in ("spill_number", "dec_region") else "text"
+                                for c in chunk.columns}
+            _to_copy_buffer(chunk, list(chunk.columns), column_types)
+
+    benchmark.extra_info["rows"] = rows
+    benchmark.pedantic(ingest, rounds=HEAVY_ROUNDS, iterations=1)
+
+
+# --- LABEL ---
+def test_label_rules(benchmark, rows, spill_frame):
+    from anomaly_rules import label_rules
+    from stream_ingest import normalize_chunk
+
+    rules = label_rules()
+    df = normalize_chunk(spill_frame.copy(), date_cols=rules.date_columns)[rules.columns]
+    chunks = [df.iloc[i:i + 200_000].copy() for i in range(0, rows, 200_000)]
+
+    def label():
+        for chunk in chunks:
+            rules.evaluate(chunk.copy())
+
+    benchmark.extra_info["rows"] = rows
+    benchmark.pedantic(label, rounds=HEAVY_ROUNDS, iterations=1)
+
+
+# --- DETECT ---
+def _description_chunks(df, size):
+    return [df.iloc[i:i + size] for i in range(0, len(df), size)]
+
+
+@pytest.mark.parametrize("kind", ["tfidf", "hashing"])
+def test_detect_fit(benchmark, kind, descriptions):
+    from detect_misle_anomalies import BATCH_SIZE, fit_descriptions
+
+    chunks = _description_chunks(descriptions, BATCH_SIZE * 10)
+    benchmark.extra_info["rows"] = len(descriptions)
+    benchmark.pedantic(lambda: fit_descriptions(iter(chunks), kind), rounds=2, iterations=1)
+
+
+@pytest.mark.parametrize("kind", ["tfidf", "hashing"])
+def test_detect_score(benchmark, kind, descriptions):
+    from detect_misle_anomalies import BATCH_SIZE, fit_descriptions, score_batch
+
+    model = fit_descriptions(iter(_description_chunks(descriptions, BATCH_SIZE * 10)), kind)
+    batches = _description_chunks(descriptions, BATCH_SIZE)
+    benchmark.extra_info["rows"] = len(descriptions)
+    benchmark.pedantic(lambda: [score_batch(model, b) for b in batches], rounds=HEAVY_ROUNDS, iterations=1)
+
+
+# --- PREDICT ---
+@pytest.fixture(scope="module")
+def dqn_model():
+    from episode_sampler import EpisodeSampler
+    from stable_baselines3 import DQN
+
+    if os.path.exists(MODEL_PATH):
+        return DQN.load(MODEL_PATH, device="cpu")
+    # Latency does not depend on the weights; an untrained net of the same shape will do
+    from database_healing_env_realistic_v3 import RealisticDatabaseHealingEnvV3
+    from train_dqn_agent_realistic_v3 import build_model
+    env = RealisticDatabaseHealingEnvV3(sampler=EpisodeSampler.from_flags(np.array([0, 1]), seed=0))
+    return build_model(env, seed=0, verbose=0, tensorboard_log=None)
+
+
+@pytest.fixture(scope="module")
+def numpy_policy(dqn_model, tmp_path_factory):
+    from numpy_policy import NumpyPolicy, export_policy
+
+    path = str(tmp_path_factory.mktemp("policy") / "policy.npz")
+    export_policy(dqn_model, path)
+    return NumpyPolicy(path)
+
+
+@pytest.fixture(scope="module")
+def observations():
+    return np.random.default_rng(0).random((1000, 8)).astype(np.float32) * [1, 100, 1000, 1, 1, 1, 1, 1]
+
+
+def test_predict_sb3_single(benchmark, dqn_model, observations):
+    benchmark(dqn_model.predict, observations[0], deterministic=True)
+
+
+def test_predict_numpy_single(benchmark, numpy_policy, observations):
+    benchmark(numpy_policy.predict, observations[0])
+
+
+def test_predict_numpy_batch(benchmark, numpy_policy, observations):
+    benchmark.extra_info["obs"] = len(observations)
+    benchmark(numpy_policy.predict, observations)
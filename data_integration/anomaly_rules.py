@@ -0,0 +1,169 @@
+"""
+Script: anomaly_rules.py
+Purpose: Declarative anomaly rules shared by the labeler and the stream inspector.
+
+Each `Rule` declares the columns it reads, a SQL predicate and the equivalent
+vectorized pandas mask. A `RuleSet` compiles its rules into:
+- a `CASE WHEN ... THEN 1 ELSE 0 END` flag expression / OR-ed WHERE fragment,
+- a projection of only the columns the rules need (plus the key),
+- a chunked pandas evaluation that keeps per-rule hit counts and timings.
+
+Rule sets:
+- LABEL_RULES:  data-quality rules stored as `spill_incidents.spill_anomaly_flag`.
+- STREAM_RULES: checks applied to rows arriving in `stream_buffer`.
+"""
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    columns: tuple
+    sql: str
+    mask: object  # callable(df) -> boolean Series
+    date_columns: tuple = ()
+
+    def evaluate(self, df):
+        return self.mask(df).fillna(False).to_numpy(dtype=bool)
+
+
+@dataclass
+class RuleStats:
+    rows: int = 0
+    hits: dict = field(default_factory=dict)
+    seconds: dict = field(default_factory=dict)
+
+    def summary(self):
+        lines = [f"{self.rows} rows evaluated"]
+        for name, hits in self.hits.items():
+            lines.append(f"  {name:<24} {hits:>9} hits  {self.seconds.get(name, 0.0) * 1000:8.1f} ms")
+        for name in self.seconds.keys() - self.hits.keys():
+            lines.append(f"  {name:<24} {'':>14}  {self.seconds[name] * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+class RuleSet:
+    def __init__(self, rules, key="spill_number"):
+        self.rules = list(rules)
+        self.key = key
+        self.stats = RuleStats(hits={r.name: 0 for r in self.rules}, seconds={r.name: 0.0 for r in self.rules})
+
+    @property
+    def columns(self):
+        """Key plus every column any rule reads, in first-use order."""
+        return list(dict.fromkeys([self.key] + [c for r in self.rules for c in r.columns]))
+
+    @property
+    def date_columns(self):
+        return list(dict.fromkeys(c for r in self.rules for c in r.date_columns))
+
+    # --- SQL ---
+    def where_sql(self):
+        return " OR ".join(f"({r.sql})" for r in self.rules)
+
+    def flag_sql(self):
+        return f"CASE WHEN {self.where_sql()} THEN 1 ELSE 0 END"
+
+    def select_sql(self, table, where=None, order_by=None, limit=None):
+        query = f"SELECT {', '.join(self.columns)} FROM {table}"
+        if where:
+            query += f" WHERE {where}"
+        if order_by:
+            query += f" ORDER BY {order_by}"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        return query
+
+    def count_sql(self, table, where=None):
+        """One scan returning the row count and each rule's hit count."""
+        counts = ", ".join(f"count(*) FILTER (WHERE {r.sql}) AS {r.name}" for r in self.rules)
+        return f"SELECT count(*) AS rows, {counts} FROM {table}" + (f" WHERE {where}" if where else "")
+
+    def count_in_db(self, conn, table, where=None):
+        start = time.perf_counter()
+        row = conn.execute(text(self.count_sql(table, where))).mappings().one()
+        self.stats.rows += row["rows"]
+        for r in self.rules:
+            self.stats.hits[r.name] += row[r.name]
+        self.stats.seconds["sql_scan"] = self.stats.seconds.get("sql_scan", 0.0) + time.perf_counter() - start
+        return self.stats
+
+    # --- PANDAS ---
+    def prepare(self, df):
+        for col in self.date_columns:
+            if col in df and not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col], errors="coerce")
+        return df
+
+    def masks(self, df):
+        """Per-rule boolean arrays for one chunk; updates hit counts and timings."""
+        self.prepare(df)
+        result = {}
+        for r in self.rules:
+            start = time.perf_counter()
+            hit = r.evaluate(df)
+            self.stats.seconds[r.name] += time.perf_counter() - start
+            self.stats.hits[r.name] += int(hit.sum())
+            result[r.name] = hit
+        self.stats.rows += len(df)
+        return result
+
+    def evaluate(self, df):
+        """Combined flag (any rule hit) for each row of `df`."""
+        flag = np.zeros(len(df), dtype=bool)
+        for hit in self.masks(df).values():
+            flag |= hit
+        return flag
+
+    def filter(self, df):
+        return df[self.evaluate(df)]
+
+    def scan(self, engine, table, where=None, chunksize=200_000):
+        """Stream the projected columns of `table` in chunks; yields (chunk, flag array).
+
+        Uses a server-side cursor, so only one chunk is held in client memory at a time.
+        """
+        with engine.connect().execution_options(stream_results=True) as conn:
+            for chunk in pd.read_sql(text(self.select_sql(table, where)), conn, chunksize=chunksize):
+                yield chunk, self.evaluate(chunk)
+
+
+# --- RULE SETS ---
+# pandas `(close - spill).dt.days > 30` floors to whole days, i.e. a gap of at least 31 days.
+def label_rules():
+    return RuleSet([
+        Rule("missing_zip", ("zip_code",), "zip_code IS NULL",
+             lambda df: df["zip_code"].isna()),
+        Rule("recovered_gt_quantity", ("recovered", "quantity"), "recovered > quantity",
+             lambda df: df["recovered"] > df["quantity"]),
+        Rule("spill_after_close", ("spill_date", "close_date"), "spill_date > close_date",
+             lambda df: df["spill_date"] > df["close_date"], date_columns=("spill_date", "close_date")),
+        Rule("duration_gt_30_days", ("spill_date", "close_date"), "close_date - spill_date >= INTERVAL '31 days'",
+             lambda df: (df["close_date"] - df["spill_date"]).dt.days > 30, date_columns=("spill_date", "close_date")),
+    ])
+
+
+def stream_rules():
+    return RuleSet([
+        Rule("flagged", ("spill_anomaly_flag",), "spill_anomaly_flag = 1",
+             lambda df: df["spill_anomaly_flag"] == 1),
+        Rule("large_quantity", ("quantity",), "quantity > 10000",
+             lambda df: df["quantity"] > 10000),
+        Rule("unknown_material", ("material_name",), "lower(material_name) LIKE '%unknown%'",
+             lambda df: df["material_name"].str.lower().str.contains("unknown", regex=False, na=False)),
+        Rule("missing_spill_date", ("spill_date",), "spill_date IS NULL",
+             lambda df: df["spill_date"].isna()),
+        Rule("missing_recovered", ("recovered",), "recovered IS NULL",
+             lambda df: df["recovered"].isna()),
+    ])
+
+
+# Shared definitions; use label_rules()/stream_rules() for a RuleSet with its own stats
+LABEL_RULES = label_rules()
+STREAM_RULES = stream_rules()
@@ -0,0 +1,124 @@
+"""
+Shared bulk loader for the preprocessing scripts.
+
+Streams DataFrame chunks into PostgreSQL through `COPY ... FROM STDIN` into a
+temporary staging table, then moves them into the target table with
+`INSERT ... ON CONFLICT DO NOTHING`, so deduplication against existing rows
+happens server-side instead of in a Python set of every primary key.
+"""
+
+import io
+import resource
+import time
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+INTEGER_TYPES = {"smallint", "integer", "bigint"}
+
+
+@dataclass
+class LoadStats:
+    rows_read: int = 0
+    rows_inserted: int = 0
+    chunks: int = 0
+    seconds: float = 0.0
+    peak_rss_mb: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.seconds if self.seconds > 0 else 0.0
+
+    def summary(self):
+        return (f"{self.rows_inserted} inserted / {self.rows_read} read "
+                f"({self.rows_read - self.rows_inserted} skipped) in {self.chunks} chunks, "
+                f"{self.rows_per_second:,.0f} rows/s, peak RSS {self.peak_rss_mb:.0f} MB")
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def normalize_columns(df):
+    df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
+    return df
+
+
+def table_column_types(conn, table):
+    rows = conn.execute(
+        text("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = :t"),
+        {"t": table},
+    ).fetchall()
+    return {name: data_type for name, data_type in rows}
+
+
+def _to_copy_buffer(df, columns, column_types):
+    out = df[columns].copy()
+    for col in columns:
+        if column_types[col] in INTEGER_TYPES and out[col].dtype.kind == "f":
+            # NaN forces pandas ints to float; COPY rejects "12.0" for integer columns
+            out[col] = out[col].round().astype("Int64")
+    buf = io.StringIO()
+    out.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    return buf
+
+
+def copy_frame(cur, table, df, column_types):
+    """COPY the columns of `df` that exist in `column_types` into `table` over a raw cursor."""
+    columns = [c for c in df.columns if c in column_types]
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        _to_copy_buffer(df, columns, column_types),
+    )
+    return columns
+
+
+def copy_chunks(engine, table, key, chunks):
+    """COPY an iterable of DataFrames into `table`, skipping rows whose `key` already exists.
+
+    Rows are kept in first-seen order per key, matching `drop_duplicates(keep="first")`.
+    """
+    stats = LoadStats()
+    start = time.perf_counter()
+    staging = f"_staging_{table}"
+
+    with engine.connect() as conn:
+        column_types = table_column_types(conn, table)
+    if not column_types:
+        raise ValueError(f"Table '{table}' does not exist.")
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute(f"CREATE TEMP TABLE IF NOT EXISTS {staging} (LIKE {table}) ON COMMIT DELETE ROWS")
+        cur.execute(f"ALTER TABLE {staging} ADD COLUMN IF NOT EXISTS _ord BIGSERIAL")
+        raw.commit()
+
+        for chunk in chunks:
+            chunk = chunk.dropna(subset=[key])
+            col_list = ", ".join(copy_frame(cur, staging, chunk, column_types))
+            cur.execute(f"""
+                INSERT INTO {table} ({col_list})
+                SELECT DISTINCT ON ({key}) {col_list} FROM {staging}
+                ORDER BY {key}, _ord
+                ON CONFLICT ({key}) DO NOTHING
+            """)
+            stats.rows_inserted += max(cur.rowcount, 0)
+            raw.commit()
+
+            stats.rows_read += len(chunk)
+            stats.chunks += 1
+
+        cur.execute(f"DROP TABLE IF EXISTS {staging}")
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    stats.seconds = time.perf_counter() - start
+    stats.peak_rss_mb = peak_rss_mb()
+    return stats
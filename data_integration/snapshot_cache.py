@@ -0,0 +1,240 @@
+"""
+Script: snapshot_cache.py
+Purpose: Local columnar snapshots of `spill_incidents` / `misle_reports` and of the
+parsed MISLE workbook, so repeated offline runs skip full-table transfers and
+Excel parsing.
+
+Table snapshots are split into Parquet partitions by primary key
+(`key // partition_size`) under <cache>/<table>/, with a manifest.json that
+records the max-key watermark and, per partition, its row count and a
+server-side content hash (`sum(hashtext(row::text))`).
+- refresh():            fetch only rows past the watermark (append-only tables).
+- refresh(verify=True): also compare per-partition hashes computed in Postgres
+                        and re-fetch only partitions whose content changed.
+Partitions are read back memory-mapped with column projection.
+
+The workbook cache is keyed by the file's content hash; a changed workbook is
+parsed once and replaces the previous entry.
+
+    python snapshot_cache.py spill_incidents misle_reports [--verify]
+    python snapshot_cache.py --excel ../data/misle_data.xlsx
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+from db_session import get_engine
+
+# --- CONFIGURATION ---
+CACHE_DIR = os.environ.get("SNAPSHOT_CACHE_DIR", "../snapshot_cache")
+PARTITION_SIZE = 50_000
+TABLE_KEYS = {"spill_incidents": "spill_number", "misle_reports": "activity_id"}
+
+PG_TO_ARROW = {
+    "bigint": pa.int64(), "integer": pa.int64(), "smallint": pa.int64(),
+    "double precision": pa.float64(), "real": pa.float64(), "numeric": pa.float64(),
+    "date": pa.date32(), "timestamp without time zone": pa.timestamp("us"),
+    "timestamp with time zone": pa.timestamp("us", tz="UTC"), "boolean": pa.bool_(),
+}
+
+
+def _write_atomic(table, path):
+    tmp = path + ".tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def _to_arrow(df, schema):
+    columns = []
+    for field in schema:
+        values = df[field.name]
+        if values.isna().all():
+            columns.append(pa.nulls(len(df), field.type))
+        elif pa.types.is_string(field.type):
+            columns.append(pa.array(values.map(lambda v: None if pd.isna(v) else str(v)), type=field.type))
+        else:
+            columns.append(pa.array(values, from_pandas=True).cast(field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+class TableSnapshot:
+    def __init__(self, engine, table, key=None, partition_size=PARTITION_SIZE, cache_dir=CACHE_DIR):
+        self.engine = engine
+        self.table = table
+        self.key = key or TABLE_KEYS[table]
+        self.partition_size = partition_size
+        self.directory = os.path.join(cache_dir, table)
+        self.manifest_path = os.path.join(self.directory, "manifest.json")
+        self.manifest = self._load_manifest()
+
+    # --- MANIFEST ---
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+            if manifest["key"] == self.key and manifest["partition_size"] == self.partition_size:
+                return manifest
+        return {"table": self.table, "key": self.key, "partition_size": self.partition_size,
+                "max_key": None, "partitions": {}}
+
+    def _save_manifest(self):
+        self.manifest["refreshed_at"] = time.time()
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    def _path(self, part):
+        return os.path.join(self.directory, f"part-{int(part):08d}.parquet")
+
+    def _schema(self, conn):
+        rows = conn.execute(text("""
+            SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_name = :t ORDER BY ordinal_position
+        """), {"t": self.table}).all()
+        return pa.schema([(name, PG_TO_ARROW.get(dtype, pa.string())) for name, dtype in rows])
+
+    # --- REFRESH ---
+    def _partition_hashes(self, conn, where="", params=None):
+        rows = conn.execute(text(f"""
+            SELECT {self.key} / :size AS part, count(*) AS n, sum(hashtext(t::text)::bigint) AS h
+            FROM {self.table} t {where} GROUP BY 1
+        """), {"size": self.partition_size, **(params or {})}).all()
+        return {str(int(part)): [int(n), int(h)] for part, n, h in rows}
+
+    def _fetch(self, conn, schema, parts):
+        """Re-materialize the given partitions; returns the number of rows written."""
+        rows = 0
+        for part in sorted(parts, key=int):
+            lo = int(part) * self.partition_size
+            df = pd.read_sql(text(f"SELECT * FROM {self.table} WHERE {self.key} >= :lo AND {self.key} < :hi "
+                                  f"ORDER BY {self.key}"), conn, params={"lo": lo, "hi": lo + self.partition_size})
+            if df.empty:
+                continue
+            _write_atomic(_to_arrow(df, schema), self._path(part))
+            rows += len(df)
+        return rows
+
+    def refresh(self, verify=False):
+        """Bring the snapshot up to date; returns (partitions refreshed, rows fetched)."""
+        os.makedirs(self.directory, exist_ok=True)
+        partitions = self.manifest["partitions"]
+        # One consistent snapshot for hashes and fetched rows
+        with self.engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+            schema = self._schema(conn)
+            if verify:
+                current = self._partition_hashes(conn)
+                stale = [p for p, h in current.items() if partitions.get(p) != h]
+                for gone in set(partitions) - set(current):
+                    os.remove(self._path(gone))
+                    del partitions[gone]
+            else:
+                # Partitions at or past the watermark: the last one may have been partially filled
+                watermark = self.manifest["max_key"]
+                where, params = "", {}
+                if watermark is not None:
+                    lo = (watermark // self.partition_size) * self.partition_size
+                    where, params = f"WHERE {self.key} >= :lo", {"lo": lo}
+                current = self._partition_hashes(conn, where, params)
+                stale = [p for p, h in current.items() if partitions.get(p) != h]
+
+            rows = self._fetch(conn, schema, stale)
+            for part in stale:
+                partitions[part] = current[part]
+            self.manifest["max_key"] = conn.execute(text(f"SELECT max({self.key}) FROM {self.table}")).scalar()
+        self._save_manifest()
+        return len(stale), rows
+
+    # --- READ ---
+    def files(self):
+        return [self._path(p) for p in sorted(self.manifest["partitions"], key=int)]
+
+    def iter_partitions(self, columns=None):
+        """Yield one DataFrame per partition, memory-mapped and projected to `columns`."""
+        for path in self.files():
+            yield pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+    def iter_batches(self, columns=None, batch_size=50_000):
+        for path in self.files():
+            for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size, columns=columns):
+                yield batch.to_pandas()
+
+    def read(self, columns=None):
+        tables = [pq.read_table(path, columns=columns, memory_map=True) for path in self.files()]
+        if not tables:
+            raise ValueError(f"Snapshot of {self.table} is empty; run refresh() first.")
+        return pa.concat_tables(tables).to_pandas()
+
+
+def snapshot(table, engine=None, verify=False, **kwargs):
+    """Refreshed snapshot of `table`, ready to read."""
+    snap = TableSnapshot(engine or get_engine(), table, **kwargs)
+    parts, rows = snap.refresh(verify=verify)
+    print(f"📦 Snapshot {table}: {parts} partitions refreshed ({rows} rows fetched), "
+          f"{len(snap.manifest['partitions'])} cached")
+    return snap
+
+
+# --- EXCEL CACHE ---
+def file_digest(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _frame_to_arrow(df):
+    """Arrow table for a parsed sheet; object columns with mixed cell types are stored as strings."""
+    columns = {}
+    for name in df.columns:
+        try:
+            columns[str(name)] = pa.array(df[name], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columns[str(name)] = pa.array(df[name].map(lambda v: None if pd.isna(v) else str(v)))
+    return pa.table(columns)
+
+
+def cached_excel(path, cache_dir=CACHE_DIR, **read_kwargs):
+    """`pd.read_excel(path)`, parsed only once per distinct file content."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.join(cache_dir, "excel")
+    target = os.path.join(directory, f"{stem}-{file_digest(path)}.parquet")
+    if os.path.exists(target):
+        return pq.read_table(target, memory_map=True).to_pandas()
+
+    df = pd.read_excel(path, **read_kwargs)
+    os.makedirs(directory, exist_ok=True)
+    for old in glob.glob(os.path.join(directory, f"{stem}-*.parquet")):
+        os.remove(old)
+    _write_atomic(_frame_to_arrow(df), target)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh local Parquet snapshots.")
+    parser.add_argument("tables", nargs="*", help=f"tables to snapshot ({', '.join(TABLE_KEYS)})")
+    parser.add_argument("--verify", action="store_true", help="re-fetch partitions whose content changed")
+    parser.add_argument("--excel", default=None, help="also cache this workbook")
+    args = parser.parse_args()
+    unknown = set(args.tables) - set(TABLE_KEYS)
+    if unknown:
+        parser.error(f"no primary key configured for {', '.join(sorted(unknown))}")
+
+    engine = get_engine()
+    for table in args.tables:
+        start = time.perf_counter()
+        snapshot(table, engine, verify=args.verify)
+        print(f"⏱️  {table} refreshed in {time.perf_counter() - start:.2f}s")
+    if args.excel:
+        start = time.perf_counter()
+        df = cached_excel(args.excel)
+        print(f"📗 {args.excel}: {len(df)} rows cached in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,126 @@
+"""
+Script: stream_ingest.py
+Purpose: Constant-memory readers for the CSV and xlsx source files.
+
+- CSV:  `pd.read_csv(..., chunksize=N)`.
+- xlsx: openpyxl read-only mode, which streams rows from the sheet XML instead of
+        building the whole workbook in memory; rows are grouped into DataFrames
+        of N rows.
+
+Each chunk is normalized (column names, renames, dates) on its own and handed
+straight to the writer (`bulk_loader.copy_chunks`), so peak memory is bounded by
+the chunk size rather than the file size.
+
+Benchmark full-file vs. streamed reading (each run in a fresh process, so the
+peak RSS figures are independent):
+    python stream_ingest.py ../data/misle_data.xlsx ../data/spill_incidents.csv
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+from bulk_loader import normalize_columns, peak_rss_mb
+
+CHUNK_SIZE = 50_000
+
+
+# --- READERS ---
+def iter_csv_chunks(path, chunksize=CHUNK_SIZE, **read_kwargs):
+    yield from pd.read_csv(path, chunksize=chunksize, low_memory=False, **read_kwargs)
+
+
+def iter_xlsx_chunks(path, chunksize=CHUNK_SIZE, sheet=None):
+    """Rows of one sheet (the first by default, like `pd.read_excel`) as DataFrame chunks."""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet] if sheet else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(h) if h is not None else f"unnamed:_{i}" for i, h in enumerate(header)]
+        width = len(columns)
+        buffer = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            buffer.append(row[:width] + (None,) * (width - len(row)))
+            if len(buffer) == chunksize:
+                yield pd.DataFrame(buffer, columns=columns)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columns)
+    finally:
+        workbook.close()
+
+
+def iter_file_chunks(path, chunksize=CHUNK_SIZE):
+    if path.endswith((".xlsx", ".xlsm")):
+        return iter_xlsx_chunks(path, chunksize)
+    return iter_csv_chunks(path, chunksize)
+
+
+def normalize_chunk(df, rename=None, date_cols=()):
+    df = normalize_columns(df)
+    if rename:
+        df = df.rename(columns=rename)
+    for col in date_cols:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+
+# --- BENCHMARK ---
+def _consume(chunks):
+    """What the writer does with each chunk, minus the network: render it as COPY CSV."""
+    rows = 0
+    for chunk in chunks:
+        buf = io.StringIO()
+        normalize_chunk(chunk).to_csv(buf, index=False, header=False)
+        rows += len(chunk)
+    return rows
+
+
+def _run_child(mode, path, chunksize):
+    start = time.perf_counter()
+    if mode == "full":
+        df = pd.read_excel(path) if path.endswith((".xlsx", ".xlsm")) else pd.read_csv(path, low_memory=False)
+        rows = _consume([df])
+    else:
+        rows = _consume(iter_file_chunks(path, chunksize))
+    print(json.dumps({"rows": rows, "seconds": time.perf_counter() - start, "peak_rss_mb": peak_rss_mb()}))
+
+
+def benchmark(path, chunksize=CHUNK_SIZE):
+    results = {}
+    for mode in ("full", "stream"):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), path, "--child", mode,
+                              "--chunksize", str(chunksize)], capture_output=True, text=True, check=True)
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark full-file vs. streamed ingestion.")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--child", choices=["full", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _run_child(args.child, args.paths[0], args.chunksize)
+        raise SystemExit
+
+    for path in args.paths:
+        r = benchmark(path, args.chunksize)
+        print(f"📊 {path} ({r['full']['rows']} rows)")
+        for mode in ("full", "stream"):
+            print(f"  {mode:<7} {r[mode]['seconds']:7.2f}s   peak RSS {r[mode]['peak_rss_mb']:7.0f} MB")
@@ -0,0 +1,151 @@
+"""
+Script: action_log.py
+Purpose: Structured, append-only action log for the streaming agent.
+
+Replaces the stringified state lists in `agent_log.csv` with columnar Arrow
+record batches: the eight state components (and the state after the action, `next_*`, used to
+seed the replay buffer) are typed float32 columns, and batches are flushed to
+disk while the run is in progress.
+
+- `.arrow` files use the Arrow IPC stream format (readable up to the last
+  flushed batch even if the run is killed) and are memory-mapped on read.
+- `.parquet` files are written with one row group per flushed batch.
+- `.csv` logs from earlier runs can still be read, or converted with
+    python action_log.py agent_log.csv agent_log.arrow
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+STATE_COLUMNS = ["missing_pct", "anomaly_count", "query_latency", "act1", "act2", "act3", "act4", "act5"]
+NEXT_STATE_COLUMNS = ["next_" + name for name in STATE_COLUMNS]
+
+SCHEMA = pa.schema(
+    [
+        ("timestamp", pa.timestamp("us")),
+        ("spill_number", pa.int64()),
+        ("action_id", pa.int8()),
+        ("action_name", pa.string()),
+        ("reward", pa.float32()),
+    ]
+    + [(name, pa.float32()) for name in STATE_COLUMNS + NEXT_STATE_COLUMNS]
+)
+
+
+class ActionLogWriter:
+    """Buffers log rows and flushes them as record batches every `flush_rows` rows."""
+
+    def __init__(self, path, flush_rows=4096):
+        self.path = path
+        self.flush_rows = flush_rows
+        self._pending = []
+        self._pending_rows = 0
+        if path.endswith(".parquet"):
+            self._writer = pq.ParquetWriter(path, SCHEMA)
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = ipc.new_stream(self._sink, SCHEMA)
+
+    def write(self, timestamps, spill_numbers, action_ids, action_names, rewards, states, next_states=None):
+        """Append a batch of decisions; `states` / `next_states` are (n, 8) arrays (next_* null if omitted)."""
+        states = np.asarray(states, dtype=np.float32).reshape(-1, len(STATE_COLUMNS))
+        if next_states is None:
+            next_columns = [pa.nulls(len(states), pa.float32())] * len(NEXT_STATE_COLUMNS)
+        else:
+            next_states = np.asarray(next_states, dtype=np.float32).reshape(states.shape)
+            next_columns = [pa.array(next_states[:, i]) for i in range(len(NEXT_STATE_COLUMNS))]
+        columns = [
+            pa.array(pd.to_datetime(np.asarray(timestamps)), type=pa.timestamp("us")),
+            pa.array(np.asarray(spill_numbers, dtype=np.int64)),
+            pa.array(np.asarray(action_ids, dtype=np.int8)),
+            pa.array(list(action_names), type=pa.string()),
+            pa.array(np.asarray(rewards, dtype=np.float32)),
+        ] + [pa.array(states[:, i]) for i in range(len(STATE_COLUMNS))] + next_columns
+        self._pending.append(pa.RecordBatch.from_arrays(columns, schema=SCHEMA))
+        self._pending_rows += len(states)
+        if self._pending_rows >= self.flush_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        table = pa.Table.from_batches(self._pending, schema=SCHEMA).combine_chunks()
+        self._writer.write_table(table)
+        if not self.path.endswith(".parquet"):
+            self._sink.flush()
+        self._pending = []
+        self._pending_rows = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        if not self.path.endswith(".parquet"):
+            self._sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# --- READERS ---
+def _read_csv_log(path, columns=None):
+    """Parse a legacy agent_log.csv, splitting the state strings in one vectorized pass."""
+    df = pd.read_csv(path)
+    state = df.pop("state").str.strip("[]").str.split(",", expand=True).astype(np.float32)
+    state.columns = STATE_COLUMNS
+    df = pd.concat([df, state], axis=1)
+    for name in NEXT_STATE_COLUMNS:
+        df[name] = np.float32(np.nan)
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    return df if columns is None else df[columns]
+
+
+def iter_action_log(path, columns=None):
+    """Yield the log as DataFrames, one per stored record batch / row group."""
+    if path.endswith(".csv"):
+        yield _read_csv_log(path, columns)
+    elif path.endswith(".parquet"):
+        yield from (b.to_pandas() for b in pq.ParquetFile(path).iter_batches(columns=columns))
+    else:
+        with pa.memory_map(path) as source:
+            for batch in ipc.open_stream(source):
+                yield (batch if columns is None else batch.select(columns)).to_pandas()
+
+
+def read_action_log(path, columns=None):
+    """Load the whole log (or only `columns`) as a DataFrame; Arrow files are memory-mapped."""
+    if path.endswith(".csv"):
+        return _read_csv_log(path, columns)
+    if path.endswith(".parquet"):
+        return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+    with pa.memory_map(path) as source:
+        table = ipc.open_stream(source).read_all()
+    return (table if columns is None else table.select(columns)).to_pandas()
+
+
+def convert_csv_log(csv_path, out_path):
+    """Rewrite a legacy CSV log in the columnar format chosen by `out_path`'s suffix."""
+    df = _read_csv_log(csv_path)
+    with ActionLogWriter(out_path) as writer:
+        writer.write(df["timestamp"], df["spill_number"], df["action_id"], df["action_name"],
+                     df["reward"], df[STATE_COLUMNS].to_numpy())
+    return len(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a CSV agent log to Arrow IPC or Parquet.")
+    parser.add_argument("csv_path")
+    parser.add_argument("out_path", nargs="?", default=None)
+    args = parser.parse_args()
+
+    out_path = args.out_path or os.path.splitext(args.csv_path)[0] + ".arrow"
+    rows = convert_csv_log(args.csv_path, out_path)
+    print(f"✅ Converted {rows} rows to {out_path}")
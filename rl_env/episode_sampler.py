@@ -0,0 +1,157 @@
+"""
+Script: episode_sampler.py
+Purpose: Bulk sampler for the episode seeds used by `RealisticDatabaseHealingEnvV3.reset()`.
+
+Instead of running `SELECT * FROM stream_buffer ORDER BY RANDOM() LIMIT 1` once per
+episode, the sampler pulls `spill_anomaly_flag` values in bulk (TABLESAMPLE or random
+key-range draws) into a local ring buffer that a background thread keeps topped up.
+
+Refresh policy:
+- `refresh_interval`: seconds after which the buffered draws are considered stale and
+  a fresh batch is pulled, so rows newly streamed into `stream_buffer` get sampled.
+- `max_reuse`: how many times a buffered draw may be handed out before it is replaced.
+
+Where the flags come from is pluggable (storage_backends.py): PostgreSQL, an
+embedded SQLite/DuckDB snapshot, or an Arrow file. In-memory backends are
+sampled directly, without the ring buffer and refill thread. The PostgreSQL
+TABLESAMPLE/key-range queries that used to live here are in storage_backends.py;
+the TABLESAMPLE draw shuffles the sampled pages before its LIMIT, so refills are
+not biased toward the lowest pages.
+
+Reproducibility: only in-memory samplers honour the `rng` passed to `draw()`, so
+`env.reset(seed=...)` replays the same episodes only with `from_flags` or an
+in-memory backend. Database-backed draws depend on server-side sampling and on
+when the background refills ran; they are not reproducible from a seed.
+
+Use `EpisodeSampler.from_flags(...)` for a fully in-memory sampler (offline training).
+"""
+
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from storage_backends import PostgresStorage
+
+
+class EpisodeSampler:
+    """Ring buffer of anomaly flags refilled from `stream_buffer` in bulk."""
+
+    def __init__(self, engine=None, flags=None, method="tablesample", batch_size=512,
+                 capacity=4096, refresh_interval=30.0, max_reuse=4, background=True, seed=None,
+                 storage=None):
+        if engine is None and flags is None and storage is None:
+            raise ValueError("EpisodeSampler needs an engine, a storage backend or pre-loaded flags.")
+        if storage is None and engine is not None:
+            storage = PostgresStorage(engine, method)
+        if flags is None and storage is not None and storage.in_memory:
+            flags = storage.load_flags()
+
+        self.storage = storage
+        self.engine = getattr(storage, "engine", None)
+        self.method = method
+        self.batch_size = batch_size
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        self.max_reuse = max_reuse
+        self.rng = np.random.default_rng(seed)
+
+        self.flags = None if flags is None else np.asarray(flags, dtype=np.int8)
+        if self.flags is not None and self.flags.size == 0:
+            raise ValueError("Pre-loaded flag array is empty.")
+
+        self._buffer = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._stop = threading.Event()
+        self._filled_at = 0.0
+        self._thread = None
+
+        if self.flags is None:
+            self._refill()
+            if background:
+                self._thread = threading.Thread(target=self._run, name="episode-sampler", daemon=True)
+                self._thread.start()
+
+    @classmethod
+    def from_flags(cls, flags, seed=None):
+        """Fully in-memory sampler over a pre-loaded array of anomaly flags."""
+        return cls(flags=flags, seed=seed)
+
+    @classmethod
+    def from_table(cls, engine, seed=None):
+        """Load every flag from `stream_buffer` once and sample offline from memory."""
+        return cls.from_flags(load_anomaly_flags(engine), seed=seed)
+
+    @property
+    def in_memory(self):
+        return self.flags is not None
+
+    # --- DRAWING ---
+    def draw(self, rng=None):
+        """Return one anomaly flag (0/1) for the next episode.
+
+        `rng` (e.g. the env's np_random) is used by in-memory samplers only; buffered
+        database draws ignore it (see the module docstring on reproducibility).
+        """
+        if self.in_memory:
+            rng = self.rng if rng is None else rng
+            return int(self.flags[rng.integers(0, self.flags.size)])
+
+        with self._lock:
+            stale = time.monotonic() - self._filled_at > self.refresh_interval
+            entry = self._buffer.popleft() if self._buffer else None
+            if entry is not None and entry[1] > 1:
+                self._buffer.append((entry[0], entry[1] - 1))
+            low = len(self._buffer) < self.capacity // 4
+        if entry is None:
+            # Buffer ran dry faster than the refill thread could keep up.
+            self._refill()
+            return self.draw()
+        if stale or low:
+            self._request_refill()
+        return entry[0]
+
+    # --- REFILL ---
+    def _request_refill(self):
+        if self._thread is None:
+            self._refill()
+        else:
+            self._wanted.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wanted.wait(timeout=self.refresh_interval)
+            if self._stop.is_set():
+                break
+            self._wanted.clear()
+            try:
+                self._refill()
+            except Exception as exc:  # keep serving the current buffer if the DB hiccups
+                print(f"⚠️ Episode sampler refill failed: {exc}")
+
+    def _refill(self):
+        flags = self._fetch_batch(self.batch_size)
+        if flags.size == 0:
+            raise RuntimeError("stream_buffer is empty; nothing to sample episodes from.")
+        self.rng.shuffle(flags)
+        with self._lock:
+            self._buffer.extend((int(f), self.max_reuse) for f in flags)
+            self._filled_at = time.monotonic()
+
+    def _fetch_batch(self, n):
+        return self.storage.sample(n, self.rng)
+
+    def close(self):
+        self._stop.set()
+        self._wanted.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self.storage is not None:
+            self.storage.close()
+
+
+def load_anomaly_flags(engine):
+    """Fetch every `spill_anomaly_flag` in `stream_buffer` as an int8 array."""
+    return PostgresStorage(engine).load_flags()
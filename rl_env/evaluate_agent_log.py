@@ -1,7 +1,8 @@
 
 """
 Script: evaluate_agent_log.py
-Purpose: Compute performance metrics for the RL agent based on agent_log.csv.
+Purpose: Compute performance metrics for the RL agent based on the action log
+(agent_log.arrow, agent_log.parquet or a legacy agent_log.csv).
 
 Metrics:
 - Mean Time to Recovery (MTTR)
@@ -12,60 +13,28 @@ Metrics:
 Author: Khondaker Zahin Fuad
 """
 
-import pandas as pd
-import numpy as np
-import ast
+import argparse
 import csv
 import os
 from datetime import datetime
+from action_log import iter_action_log
+from agent_metrics import METRIC_COLUMNS, compute_metrics
 
-# --- Load Log File ---
-df = pd.read_csv("agent_log.csv")
+parser = argparse.ArgumentParser(description="Compute agent metrics from an action log.")
+parser.add_argument("log_path", nargs="?", default="agent_log.arrow")
+parser.add_argument("--metrics-csv", default="evaluation_metrics_log.csv")
+args = parser.parse_args()
 
-# --- Parse State Vector from String to List ---
-df["state"] = df["state"].apply(ast.literal_eval)
-
-# Extract key state values
-state_df = pd.DataFrame(df["state"].tolist(), columns=[
-    "missing_pct", "anomaly_count", "query_latency", "act1", "act2", "act3", "act4", "act5"
-])
-df = pd.concat([df, state_df], axis=1)
-
-# --- Metric 1: Mean Time to Recovery (MTTR) ---
-recovery_steps = []
-counter = 0
-for count in df["anomaly_count"]:
-    counter += 1
-    if count == 0:
-        recovery_steps.append(counter)
-        counter = 0
-if not recovery_steps:
-    mttr = float("inf")
-else:
-    mttr = np.mean(recovery_steps)
-
-# --- Metric 2: Zero Downtime Success Rate (ZDSR) ---
-# Assume 'Rollback' = potential downtime
-zdsr = 1 - (df["action_name"] == "Rollback").sum() / len(df)
-
-# --- Metric 3: Anomaly Resolution Accuracy ---
-# Check if action resulted in anomaly reduction at next step
-correct = 0
-total = 0
-for i in range(len(df) - 1):
-    if df.loc[i, "anomaly_count"] > df.loc[i+1, "anomaly_count"]:
-        correct += 1
-    total += 1
-ara = correct / total if total > 0 else 0
-
-# --- Metric 4: Uptime Ratio ---
-# Define uptime as anomaly_count <= 5 and missing_pct <= 0.2
-uptime_rows = df.query("anomaly_count <= 5 and missing_pct <= 0.2").shape[0]
-uptime_ratio = uptime_rows / len(df)
+# --- Compute Metrics (streamed batch by batch, only the needed columns) ---
+results = compute_metrics(iter_action_log(args.log_path, columns=METRIC_COLUMNS))
+mttr = results["mean_time_to_recovery"]
+zdsr = results["zero_downtime_success_rate"]
+ara = results["anomaly_resolution_accuracy"]
+uptime_ratio = results["uptime_ratio"]
 
 # --- Save Results to CSV---
 # Define the CSV log file path
-csv_file_path = "evaluation_metrics_log.csv"
+csv_file_path = args.metrics_csv
 
 # Metrics dictionary (replace these with your real values after evaluation)
 metrics = {
@@ -91,7 +60,7 @@ with open(csv_file_path, mode='a', newline='') as csv_file:
     writer.writerow(metrics)
 
 # --- Print Results ---
-print("📊 Evaluation Metrics (From agent_log.csv)")
+print(f"📊 Evaluation Metrics (From {args.log_path})")
 print("------------------------------------------")
 print(f"🕒 Mean Time to Recovery (MTTR): {mttr:.2f} steps")
 print(f"⚙️  Zero Downtime Success Rate (ZDSR): {zdsr:.2%}")
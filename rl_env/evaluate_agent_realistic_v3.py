@@ -1,86 +1,130 @@
+"""
+Script: evaluate_agent_realistic_v3.py
+Purpose: Batched, deterministic evaluation of the trained DQN agent.
+
+All episodes run in lockstep in `BatchedHealingSimulator`, so each step is
+a single Q-network forward pass over the whole observation batch. Episode
+anomaly flags and dynamics come from one seeded generator, so a given
+(--episodes, --seed) pair always replays the same episodes.
+
+Metrics keep their original definitions and are reported with bootstrap
+confidence intervals over episodes; every run is appended to a history CSV.
+"""
+
+import argparse
 import os
 import numpy as np
 import pandas as pd
-from stable_baselines3 import DQN
-from stable_baselines3.common.vec_env import DummyVecEnv
-from database_healing_env_realistic_v3 import RealisticDatabaseHealingEnvV3
-from tqdm import tqdm
+from numpy_policy import load_policy
+from healing_simulator import BatchedHealingSimulator
 from datetime import datetime
 
-# Load the trained model
-MODEL_PATH = "dqn_self_healing_model_realistic_v3"
-assert os.path.exists(MODEL_PATH + ".zip"), "Trained model not found!"
-model = DQN.load(MODEL_PATH)
-
-# Initialize environment
-env = DummyVecEnv([lambda: RealisticDatabaseHealingEnvV3()])
-
-# Evaluation loop
-print("\U0001F680 Starting Real-Time Evaluation Loop")
-total_episodes = 30
-mttr_list = []
-uptime_flags = []
-anomaly_total = 0
-anomaly_resolved = 0
-uptime_total_steps = 0
-successful_uptime_steps = 0
-
-for _ in tqdm(range(total_episodes), desc="\U0001F50D Evaluating Agent"):
-    obs = env.reset()
-    done = False
-    steps = 0
-    episode_recovery_times = []
-    episode_uptime = True
+METRICS = ["mean_time_to_recovery", "zero_downtime_success_rate", "anomaly_resolution_accuracy", "uptime_ratio"]
+
 
-    while not done:
+def run_episodes(model, env):
+    """Step every env through one full episode; return per-episode counters."""
+    n = env.num_envs
+    stats = {
+        "anomaly_steps": np.zeros(n), "resolved_steps": np.zeros(n),
+        "recovery_sum": np.zeros(n), "uptime_steps": np.zeros(n),
+        "all_uptime": np.ones(n, dtype=bool), "reward": np.zeros(n),
+    }
+    obs = env.reset()
+    for _ in range(env.max_steps):
         action, _ = model.predict(obs, deterministic=True)
-        obs, reward, done_flags, infos = env.step(action)
-
-        done = done_flags[0]
-        info = infos[0]  # Extract single environment info
-        steps += 1
-
-        if info.get("anomaly_present"):
-            anomaly_total += 1
-            if info.get("anomaly_resolved"):
-                anomaly_resolved += 1
-                episode_recovery_times.append(info.get("recovery_time", 0))
-
-        if not info.get("uptime", True):
-            episode_uptime = False
-        else:
-            successful_uptime_steps += 1
-
-        uptime_total_steps += 1
-
-    # MTTR
-    if episode_recovery_times:
-        mttr_list.append(np.mean(episode_recovery_times))
-
-    # ZDSR
-    uptime_flags.append(episode_uptime)
-
-# Final Metrics
-mean_mttr = np.mean(mttr_list) if mttr_list else float("inf")
-zdsr = np.mean(uptime_flags)
-resolution_accuracy = anomaly_resolved / anomaly_total if anomaly_total > 0 else 0
-uptime_ratio = successful_uptime_steps / uptime_total_steps if uptime_total_steps > 0 else 0
-
-print("\n\U0001F4CA Evaluation Summary")
-print(f"Mean Time to Recovery (MTTR): {mean_mttr}")
-print(f"Zero Downtime Success Rate (ZDSR): {zdsr}")
-print(f"Anomaly Resolution Accuracy: {resolution_accuracy}")
-print(f"24-Hour Uptime Ratio: {uptime_ratio}")
-
-# Save results
-results_df = pd.DataFrame([{
-    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-    "mean_time_to_recovery": mean_mttr,
-    "zero_downtime_success_rate": zdsr,
-    "anomaly_resolution_accuracy": resolution_accuracy,
-    "uptime_ratio": uptime_ratio
-}])
-
-csv_path = "evaluation_metrics_realistic_v3.csv"
-results_df.to_csv(csv_path, index=False)
-print(f"✅ Results saved to {csv_path}")
+        obs, reward, _, _ = env.step(action)
+        info = env.step_info
+        stats["reward"] += reward
+
+        present = info["anomaly_present"]
+        resolved = present & info["anomaly_resolved"]
+        stats["anomaly_steps"] += present
+        stats["resolved_steps"] += resolved
+        stats["recovery_sum"] += np.where(resolved, info["recovery_time"], 0)
+        stats["uptime_steps"] += info["uptime"]
+        stats["all_uptime"] &= info["uptime"]
+    stats["steps"] = np.full(n, env.max_steps)
+    return stats
+
+
+def aggregate(stats, idx=None):
+    """Metrics over the episodes in `idx` (rows of an index matrix for bootstrap resamples)."""
+    take = (lambda a: a) if idx is None else (lambda a: a[idx])
+    resolved = take(stats["resolved_steps"])
+    has_recovery = resolved > 0
+    episode_mttr = np.divide(take(stats["recovery_sum"]), resolved, out=np.zeros(resolved.shape), where=has_recovery)
+    recovered_eps = has_recovery.sum(axis=-1)
+    anomaly_total = take(stats["anomaly_steps"]).sum(axis=-1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "mean_time_to_recovery": np.where(recovered_eps > 0, episode_mttr.sum(axis=-1) / recovered_eps, np.inf),
+            "zero_downtime_success_rate": take(stats["all_uptime"]).mean(axis=-1),
+            "anomaly_resolution_accuracy": np.where(anomaly_total > 0, resolved.sum(axis=-1) / anomaly_total, 0.0),
+            "uptime_ratio": take(stats["uptime_steps"]).sum(axis=-1) / take(stats["steps"]).sum(axis=-1),
+        }
+
+
+def bootstrap_ci(stats, resamples, confidence, seed):
+    n = stats["steps"].size
+    rng = np.random.default_rng(seed)
+    alpha = (1 - confidence) / 2
+    lows, highs = {}, {}
+    # Resample in blocks to bound the size of the index matrix
+    block = max(1, 2_000_000 // n)
+    samples = {m: [] for m in METRICS}
+    for start in range(0, resamples, block):
+        idx = rng.integers(0, n, size=(min(block, resamples - start), n), dtype=np.int32)
+        for m, values in aggregate(stats, idx).items():
+            samples[m].append(values)
+    for m in METRICS:
+        values = np.concatenate(samples[m])
+        lows[m], highs[m] = np.quantile(values, [alpha, 1 - alpha], method="inverted_cdf")
+    return lows, highs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the DQN agent on many seeded episodes at once.")
+    parser.add_argument("--model", default="dqn_self_healing_model_realistic_v3")
+    parser.add_argument("--episodes", type=int, default=30)
+    parser.add_argument("--npz", default=None, help="evaluate an exported NumPy policy instead of the SB3 model")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--bootstrap", type=int, default=1000, help="bootstrap resamples for the CIs")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--history", default="evaluation_metrics_realistic_v3.csv",
+                        help="CSV the run is appended to")
+    args = parser.parse_args()
+
+    # Load the trained model
+    assert os.path.exists(args.npz or args.model + ".zip"), "Trained model not found!"
+    model = load_policy(args.model, args.npz)
+
+    # Initialize environment: one lane per episode, anomaly flags loaded once
+    env = BatchedHealingSimulator(num_envs=args.episodes)
+    env.seed(args.seed)
+
+    print(f"\U0001F680 Evaluating {args.episodes} episodes in lockstep (seed={args.seed})")
+    stats = run_episodes(model, env)
+    results = {m: float(v) for m, v in aggregate(stats).items()}
+    lows, highs = bootstrap_ci(stats, args.bootstrap, args.confidence, args.seed)
+
+    print("\n\U0001F4CA Evaluation Summary")
+    labels = {
+        "mean_time_to_recovery": "Mean Time to Recovery (MTTR)",
+        "zero_downtime_success_rate": "Zero Downtime Success Rate (ZDSR)",
+        "anomaly_resolution_accuracy": "Anomaly Resolution Accuracy",
+        "uptime_ratio": "24-Hour Uptime Ratio",
+    }
+    for m in METRICS:
+        print(f"{labels[m]}: {results[m]:.4f} "
+              f"({args.confidence:.0%} CI {lows[m]:.4f} – {highs[m]:.4f})")
+
+    # Append results to the run history
+    row = {"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), **results,
+           "episodes": args.episodes, "seed": args.seed, "model": args.npz or args.model}
+    for m in METRICS:
+        row[f"{m}_ci_low"] = lows[m]
+        row[f"{m}_ci_high"] = highs[m]
+    pd.DataFrame([row]).to_csv(args.history, mode="a", index=False, header=not os.path.exists(args.history))
+    print(f"✅ Results appended to {args.history}")
@@ -0,0 +1,249 @@
+"""
+Script: healing_executor.py
+Purpose: Run the agent's five healing actions for real against a sandbox copy of
+the spill data, and measure their effect.
+
+Each executor owns one table in the `healing_sandbox` schema, rebuilt from a
+template copy of `spill_incidents` at every reset. Nothing outside the sandbox
+is touched. An anomalous episode starts with injected damage:
+- NULLed `quantity` values (missing_pct),
+- duplicated `spill_number` rows (anomaly_count),
+- no index on `spill_number` and stale planner statistics (query latency),
+- a bad batch of updates left uncommitted after `SAVEPOINT bad_batch` on a
+  separate writer connection. Its open transaction makes
+  CREATE INDEX CONCURRENTLY and any conflicting row update wait.
+
+Actions (same ids as RealisticDatabaseHealingEnvV3):
+    0 Impute       fill up to 10% of the rows' NULL quantities with the median
+    1 Deduplicate  delete duplicate spill_numbers, keeping the lowest ctid
+    2 Rollback     ROLLBACK TO SAVEPOINT bad_batch on the writer connection
+    3 Index        CREATE INDEX CONCURRENTLY on spill_number
+    4 Plan         ANALYZE + planner cost settings for the session
+
+Observations are measured, not simulated: the NULL ratio, the duplicate row
+count, and the probe query's `EXPLAIN ANALYZE` execution time. That time is
+scaled so the damaged sandbox reads about 450 on the env's 0-1000 query_time
+axis. Statements that hit `lock_timeout` fail, and the action has no effect.
+
+Tables are dropped on close(); after a crash, `DROP SCHEMA healing_sandbox CASCADE`
+removes any leftovers.
+
+    python healing_executor.py    # one scripted episode with measured observations
+"""
+
+import json
+import os
+import sys
+import uuid
+
+import psycopg2
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_integration"))
+from db_session import get_engine  # noqa: E402
+
+SCHEMA = "healing_sandbox"
+SOURCE_TABLE = "spill_incidents"
+SANDBOX_ROWS = 20_000
+COLUMNS = "spill_number, county, zip_code, quantity, recovered, spill_date, close_date"
+DEGRADED_QUERY_TIME = 450.0
+PROBE_SPAN = 200  # spill_numbers covered by one probe query
+ACTION_NAMES = ["Impute", "Deduplicate", "Rollback", "Index", "Plan"]
+
+
+class HealingExecutor:
+    def __init__(self, engine=None, source=SOURCE_TABLE, rows=SANDBOX_ROWS, lock_timeout_ms=250,
+                 probe_repeats=3):
+        self.engine = engine or get_engine()
+        self.source = source
+        self.rows = rows
+        self.lock_timeout_ms = lock_timeout_ms
+        self.probe_repeats = probe_repeats
+        self.table = f"{SCHEMA}.episode_{uuid.uuid4().hex[:8]}"
+        self.template = f"{self.table}_template"
+        self.index = f"{self.table.split('.')[1]}_spill_number_idx"
+        self.pending_batch = False
+        self.rng = None
+
+        # Dedicated sessions: their SET/transaction state must not leak into the shared pool
+        self._admin, self.admin = self._session(autocommit=True)
+        self._writer, self.writer = self._session(autocommit=False)
+        self._setup()
+
+    def _session(self, autocommit):
+        fairy = self.engine.raw_connection()
+        conn = fairy.dbapi_connection
+        fairy.detach()
+        conn.autocommit = autocommit
+        return fairy, conn
+
+    def _exec(self, conn, sql, params=None):
+        with conn.cursor() as cur:
+            cur.execute(sql, params)
+            return cur.fetchall() if cur.description else None
+
+    def _setup(self):
+        self._exec(self.admin, f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}")
+        self._exec(self.admin, f"""
+            CREATE TABLE {self.template} AS
+            SELECT {COLUMNS} FROM {self.source} WHERE quantity IS NOT NULL
+            ORDER BY spill_number LIMIT %s
+        """, (self.rows,))
+        count, lo, hi = self._exec(self.admin, f"SELECT count(*), min(spill_number), max(spill_number) "
+                                               f"FROM {self.template}")[0]
+        if not count:
+            raise RuntimeError(f"{self.source} has no rows to build the healing sandbox from.")
+        self.key_range = (int(lo), int(hi))
+        self._exec(self.admin, f"CREATE TABLE {self.table} (LIKE {self.template}) "
+                               f"WITH (autovacuum_enabled = false)")
+        self._reset_session()
+        # Calibrate the latency axis on the damaged layout: no index, no statistics
+        self._rebuild(indexed=False)
+        self.degraded_ms = max(self.probe_ms(), 1e-3)
+
+    def _reset_session(self):
+        self._exec(self.admin, "RESET ALL")
+        self._exec(self.admin, f"SET lock_timeout = {int(self.lock_timeout_ms)}")
+        self._exec(self.admin, "SET statement_timeout = '10s'")
+
+    def _rebuild(self, indexed):
+        self._exec(self.admin, f"DROP INDEX IF EXISTS {SCHEMA}.{self.index}")
+        self._exec(self.admin, f"TRUNCATE {self.table}")
+        self._exec(self.admin, f"INSERT INTO {self.table} SELECT * FROM {self.template}")
+        if indexed:
+            self._exec(self.admin, f"CREATE INDEX {self.index} ON {self.table} (spill_number)")
+            self._exec(self.admin, f"ANALYZE {self.table}")
+
+    # --- EPISODES ---
+    def reset(self, anomalous, rng):
+        """Rebuild the sandbox, inject damage for an anomalous episode; returns the observation."""
+        self.rng = rng
+        self._end_batch()
+        self._reset_session()
+        self._rebuild(indexed=not anomalous)
+
+        missing = rng.uniform(0.1, 0.4) if anomalous else rng.uniform(0.0, 0.1)
+        duplicates = int(rng.integers(10, 31) if anomalous else rng.integers(0, 6))
+        self._exec(self.admin, f"""
+            UPDATE {self.table} SET quantity = NULL
+            WHERE ctid IN (SELECT ctid FROM {self.table} TABLESAMPLE BERNOULLI (%s) REPEATABLE (%s))
+        """, (missing * 100, int(rng.integers(0, 2**31 - 1))))
+        if duplicates:
+            self._exec(self.admin, f"INSERT INTO {self.table} SELECT * FROM {self.table} "
+                                   f"ORDER BY random() LIMIT %s", (duplicates,))
+        if anomalous:
+            self._exec(self.writer, "SAVEPOINT bad_batch")
+            self._exec(self.writer, f"""
+                UPDATE {self.table} SET recovered = quantity * 10
+                WHERE ctid IN (SELECT ctid FROM {self.table} WHERE quantity IS NOT NULL
+                               ORDER BY random() LIMIT 50)
+            """)
+            self.pending_batch = True
+        return self.observe()
+
+    def _end_batch(self):
+        self.writer.rollback()
+        self.pending_batch = False
+
+    # --- ACTIONS ---
+    def apply(self, action):
+        """Run one action; returns True if it changed anything."""
+        try:
+            return [self._impute, self._deduplicate, self._rollback, self._index, self._plan][int(action)]()
+        except (psycopg2.errors.LockNotAvailable, psycopg2.errors.QueryCanceled):
+            # Blocked by the open bad batch (or too slow): the action has no effect
+            return False
+
+    def _impute(self):
+        rows = self._exec(self.admin, f"""
+            WITH median AS (
+                SELECT percentile_cont(0.5) WITHIN GROUP (ORDER BY quantity) AS q
+                FROM {self.table} WHERE quantity IS NOT NULL
+            )
+            UPDATE {self.table} SET quantity = (SELECT q FROM median)
+            WHERE ctid IN (SELECT ctid FROM {self.table} WHERE quantity IS NULL LIMIT %s)
+            RETURNING 1
+        """, (max(1, self.rows // 10),))
+        return bool(rows)
+
+    def _deduplicate(self):
+        rows = self._exec(self.admin, f"""
+            DELETE FROM {self.table} a USING {self.table} b
+            WHERE a.spill_number = b.spill_number AND a.ctid > b.ctid
+            RETURNING 1
+        """)
+        return bool(rows)
+
+    def _rollback(self):
+        if not self.pending_batch:
+            return False
+        self._exec(self.writer, "ROLLBACK TO SAVEPOINT bad_batch")
+        self.writer.commit()
+        self.pending_batch = False
+        return True
+
+    def _index(self):
+        valid = self._exec(self.admin, "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)",
+                           (f"{SCHEMA}.{self.index}",))
+        if valid and valid[0][0]:
+            return False
+        if valid:
+            # Left INVALID by an earlier build that timed out
+            self._exec(self.admin, f"DROP INDEX {SCHEMA}.{self.index}")
+        self._exec(self.admin, f"CREATE INDEX CONCURRENTLY {self.index} ON {self.table} (spill_number)")
+        return True
+
+    def _plan(self):
+        self._exec(self.admin, f"ANALYZE {self.table}")
+        self._exec(self.admin, "SET random_page_cost = 1.1")
+        self._exec(self.admin, "SET effective_cache_size = '1GB'")
+        return True
+
+    # --- OBSERVATION ---
+    def probe_ms(self):
+        """Best-of-N `EXPLAIN ANALYZE` execution time of the probe range query."""
+        lo_key, hi_key = self.key_range
+        times = []
+        for _ in range(self.probe_repeats):
+            lo = int(self.rng.integers(lo_key, max(lo_key + 1, hi_key - PROBE_SPAN))) if self.rng is not None else lo_key
+            plan = self._exec(self.admin, f"""
+                EXPLAIN (ANALYZE, FORMAT JSON)
+                SELECT county, count(*), sum(quantity) FROM {self.table}
+                WHERE spill_number BETWEEN %s AND %s GROUP BY county
+            """, (lo, lo + PROBE_SPAN))[0][0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            times.append(plan[0]["Execution Time"])
+        return min(times)
+
+    def observe(self):
+        """(missing_pct, duplicate rows, query_time) as measured in the sandbox."""
+        total, nulls, distinct = self._exec(self.admin, f"""
+            SELECT count(*), count(*) - count(quantity), count(DISTINCT spill_number) FROM {self.table}
+        """)[0]
+        query_time = DEGRADED_QUERY_TIME * self.probe_ms() / self.degraded_ms
+        return (nulls / total if total else 0.0,
+                min(100.0, float(total - distinct)),
+                min(1000.0, query_time))
+
+    def close(self):
+        try:
+            self._end_batch()
+            self._exec(self.admin, f"DROP TABLE IF EXISTS {self.table}, {self.template}")
+        finally:
+            self._writer.close()
+            self._admin.close()
+
+
+if __name__ == "__main__":
+    import numpy as np
+
+    executor = HealingExecutor()
+    rng = np.random.default_rng(0)
+    print(f"🧪 Sandbox {executor.table}: degraded probe {executor.degraded_ms:.3f} ms")
+    obs = executor.reset(True, rng)
+    print(f"   reset        missing={obs[0]:.3f} duplicates={obs[1]:.0f} query_time={obs[2]:.1f}")
+    for action in [3, 2, 3, 1, 0, 0, 0, 4]:
+        ok = executor.apply(action)
+        obs = executor.observe()
+        print(f"   {ACTION_NAMES[action]:<12} {'ok ' if ok else 'no-op'} missing={obs[0]:.3f} "
+              f"duplicates={obs[1]:.0f} query_time={obs[2]:.1f}")
+    executor.close()
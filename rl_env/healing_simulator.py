@@ -0,0 +1,185 @@
+"""
+Script: healing_simulator.py
+Purpose: Batched, DB-free simulator core for the self-healing environment.
+
+`BatchedHealingSimulator` holds N episodes of `RealisticDatabaseHealingEnvV3`
+as a struct-of-arrays and applies all five actions with masked NumPy operations.
+It depends on NumPy and gymnasium spaces only, so evaluation and streaming
+consumers running an exported NumPy policy start without stable_baselines3/torch.
+Training uses it through the SB3 `VecEnv` adapter in vec_healing_env.py.
+
+Episode anomaly flags are drawn from a pre-loaded flag array (e.g. a snapshot of
+`stream_buffer.spill_anomaly_flag`); only when none is given is the episode
+storage backend (Postgres by default, see storage_backends.py) read, once, at
+construction time.
+
+With `num_envs=1` and the same seed, trajectories are identical to the scalar env
+built on `EpisodeSampler.from_flags(...)`; with more envs they are identical in
+distribution.
+"""
+
+import numpy as np
+from gymnasium import spaces
+
+from storage_backends import open_storage
+
+# Reset ranges per column: (missing_pct, anomaly_count, query_time)
+NORMAL_LOW = np.array([0.0, 0.0, 50.0])
+NORMAL_HIGH = np.array([0.1, 5.0, 150.0])
+ANOMALY_LOW = np.array([0.1, 10.0, 300.0])
+ANOMALY_HIGH = np.array([0.4, 30.0, 600.0])
+
+
+class BatchedHealingSimulator:
+    def __init__(self, num_envs=1024, anomaly_flags=None, max_steps=30, seed=None, storage=None):
+        self.num_envs = num_envs
+        self.observation_space = spaces.Box(
+            low=np.array([0.0, 0.0, 0.0] + [0.0]*5),
+            high=np.array([1.0, 100.0, 1000.0] + [1.0]*5),
+            dtype=np.float32
+        )
+        self.action_space = spaces.Discrete(5)
+
+        if anomaly_flags is None:
+            backend = open_storage(storage)
+            anomaly_flags = backend.load_flags()
+            backend.close()
+        self.anomaly_flags = np.asarray(anomaly_flags, dtype=bool)
+        if self.anomaly_flags.size == 0:
+            raise ValueError("anomaly_flags is empty; nothing to sample episodes from.")
+
+        self.max_steps = max_steps
+        self.rng = np.random.default_rng(seed)
+        self._next_seed = None
+
+        # --- STRUCT-OF-ARRAYS EPISODE STATE ---
+        self.state = np.zeros((num_envs, 8), dtype=np.float32)
+        self.anomaly_present = np.zeros(num_envs, dtype=bool)
+        self.anomaly_resolved = np.zeros(num_envs, dtype=bool)
+        self.recovery_time = np.zeros(num_envs, dtype=np.int64)
+        self.steps = np.zeros(num_envs, dtype=np.int64)
+        self.uptime = np.ones(num_envs, dtype=bool)
+        self.actions = np.zeros(num_envs, dtype=np.int64)
+
+        # Per-step info as arrays, captured before auto-reset
+        self.step_info = {}
+
+    # --- RESET ---
+    def _reset_envs(self, idx, flags=None):
+        k = idx.size
+        if flags is None:
+            flags = self.anomaly_flags[self.rng.integers(0, self.anomaly_flags.size, size=k)]
+        low = np.where(flags[:, None], ANOMALY_LOW, NORMAL_LOW)
+        high = np.where(flags[:, None], ANOMALY_HIGH, NORMAL_HIGH)
+        values = low + (high - low) * self.rng.random((k, 3))
+
+        self.anomaly_present[idx] = flags
+        self.anomaly_resolved[idx] = False
+        self.recovery_time[idx] = 0
+        self.steps[idx] = 0
+        self.uptime[idx] = True
+        self.state[idx, :3] = values
+        self.state[idx, 3:] = 0.0
+
+    def seed(self, seed=None):
+        """Re-seed the generator at the next reset(), so that reset replays the same episodes."""
+        self._next_seed = seed
+        return [seed] * self.num_envs
+
+    def reset(self):
+        if self._next_seed is not None:
+            self.rng = np.random.default_rng(self._next_seed)
+            self._next_seed = None
+        self._reset_envs(np.arange(self.num_envs))
+        return self.state.copy()
+
+    def reset_with_flags(self, flags):
+        """Start fresh episodes in the first len(flags) envs with the given anomaly flags."""
+        flags = np.asarray(flags, dtype=bool)
+        self._reset_envs(np.arange(flags.size), flags)
+        return self.state[:flags.size].copy()
+
+    # --- STEP ---
+    def step(self, actions):
+        """Apply one action per env; returns (obs, rewards, dones, infos), auto-resetting finished envs."""
+        a = self.actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+        missing = self.state[:, 0].copy()
+        anomalies = self.state[:, 1].copy()
+        query_time = self.state[:, 2].copy()
+        reward = np.zeros(self.num_envs, dtype=np.float32)
+        self.steps += 1
+
+        # Impute missing
+        act = a == 0
+        ok = act & (missing > 0.05)
+        missing[ok] -= 0.1
+        reward += np.where(ok, 1, np.where(act, -4, 0))
+
+        # Remove duplicates
+        act = a == 1
+        ok = act & (anomalies > 0)
+        anomalies[ok] -= 1
+        reward += np.where(ok, 1, np.where(act, -4, 0))
+
+        # Rollback
+        act = a == 2
+        ok = act & self.anomaly_present
+        self.anomaly_present[ok] = False
+        self.anomaly_resolved[ok] = True
+        self.recovery_time[ok] += 1
+        reward += np.where(ok, 5, np.where(act, -10, 0))
+
+        # Optimize indexing (3) / reconfigure query plan (4)
+        slow = query_time > 100
+        tuned = ((a == 3) | (a == 4)) & slow
+        offset = np.where(a[tuned] == 3, 30.0, 20.0)
+        noise = offset + 30.0 * self.rng.random(int(tuned.sum()))
+        # float32 arithmetic, as in the scalar env (float32 minus a Python float)
+        query_time[tuned] -= noise.astype(np.float32)
+        reward += np.where(a == 3, np.where(slow, 2, -3), 0)
+        reward += np.where(a == 4, np.where(slow, 1, -4), 0)
+
+        self.recovery_time += 1
+        self.uptime = query_time < 100
+
+        self.state[:, 0] = np.maximum(0.0, missing)
+        self.state[:, 1] = np.maximum(0.0, anomalies)
+        self.state[:, 2] = np.maximum(0.0, query_time)
+        self.state[:, 3:7] = self.state[:, 4:8]
+        self.state[:, 7] = 1.0
+
+        dones = self.steps >= self.max_steps
+        self.step_info = {
+            "anomaly_present": self.anomaly_present.copy(),
+            "anomaly_resolved": self.anomaly_resolved.copy(),
+            "recovery_time": np.where(self.anomaly_resolved, self.recovery_time, 0),
+            "uptime": self.uptime.copy(),
+        }
+        infos = self._build_infos(dones)
+
+        done_idx = np.flatnonzero(dones)
+        if done_idx.size:
+            self._reset_envs(done_idx)
+        return self.state.copy(), reward, dones, infos
+
+    def _build_infos(self, dones):
+        present = self.step_info["anomaly_present"].tolist()
+        resolved = self.step_info["anomaly_resolved"].tolist()
+        recovery = self.step_info["recovery_time"].tolist()
+        uptime = self.step_info["uptime"].tolist()
+        infos = [
+            {
+                "anomaly_present": present[i],
+                "anomaly_resolved": resolved[i],
+                "recovery_time": recovery[i],
+                "uptime": uptime[i],
+                "TimeLimit.truncated": False,
+            }
+            for i in range(self.num_envs)
+        ]
+        for i in np.flatnonzero(dones):
+            infos[i]["terminal_observation"] = self.state[i].copy()
+        return infos
+
+    def close(self):
+        pass
@@ -0,0 +1,267 @@
+"""
+Script: health_collector.py
+Purpose: Measure live database health and publish it as the agent's observation.
+
+At a fixed interval, the collector samples several sources, all cheap:
+- pg_stat_user_tables: live/dead tuples, sequential vs. index scans (catalog counters),
+- a TABLESAMPLE SYSTEM scan of `stream_buffer` and `spill_incidents`: the share of
+  rows with NULLs in the rule columns, and the share flagged as anomalous,
+- pg_stat_statements (when installed): mean execution time of statements that
+  touched those tables since the previous sample. Without the extension, the
+  sampled scan's own latency stands in.
+
+It writes the latest normalized observation to shared memory:
+
+    missing_pct    share of sampled rows with a NULL rule column   (0-1)
+    anomaly_count  % of sampled rows with spill_anomaly_flag = 1   (0-100)
+    query_time     mean statement latency in ms                    (0-1000)
+
+anomaly_count is a percentage, not the duplicate-row count the simulated env
+uses (healthy 0-5, anomalous 10-30); the env rescales it with `anomaly_scale`.
+
+A seqlock guards the block. The writer makes the sequence number odd,
+writes, then makes it even again. Readers retry if the number was odd or
+changed under them, so reads take no locks and never block the collector.
+
+    python health_collector.py [--interval 1.0] [--sample-pct 1.0]   # run the collector
+    python health_collector.py --read                                 # tail the published vector
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_integration"))
+from db_session import get_engine  # noqa: E402
+
+SHM_NAME = "logistics_health"
+TABLES = ("stream_buffer", "spill_incidents")
+NULL_COLUMNS = ("zip_code", "quantity", "recovered", "spill_date")
+OBS_FIELDS = ("missing_pct", "anomaly_count", "query_time")
+RAW_FIELDS = ("sampled_rows", "null_rows", "flagged_rows", "dead_tuple_ratio", "seq_scan_ratio",
+              "statement_calls", "statement_ms", "collect_ms")
+OBS_HIGH = np.array([1.0, 100.0, 1000.0])
+
+# Shared block: seq (uint64) | timestamp (float64) | obs (float64 x 3) | raw (float64 x N)
+_OBS_AT = 16
+_RAW_AT = _OBS_AT + 8 * len(OBS_FIELDS)
+BLOCK_SIZE = _RAW_AT + 8 * len(RAW_FIELDS)
+_OWNED = set()  # blocks created by collectors in this process
+
+# Tagged so pg_stat_statements deltas can leave the collector's own queries out
+TAG = "/* health_collector */"
+STATEMENTS_QUERY = text(f"""
+    {TAG} SELECT coalesce(sum(calls), 0), coalesce(sum(total_exec_time), 0) FROM pg_stat_statements
+    WHERE dbid = (SELECT oid FROM pg_database WHERE datname = current_database())
+      AND query ~* :tables AND query NOT LIKE '%health_collector%'
+""")
+TABLE_STATS_QUERY = text(f"""
+    {TAG} SELECT coalesce(sum(n_live_tup), 0), coalesce(sum(n_dead_tup), 0),
+           coalesce(sum(seq_scan), 0), coalesce(sum(idx_scan), 0)
+    FROM pg_stat_user_tables WHERE relname = ANY(:tables)
+""")
+
+
+def _views(buf):
+    seq = np.ndarray((1,), np.uint64, buf, 0)
+    stamp = np.ndarray((1,), np.float64, buf, 8)
+    obs = np.ndarray((len(OBS_FIELDS),), np.float64, buf, _OBS_AT)
+    raw = np.ndarray((len(RAW_FIELDS),), np.float64, buf, _RAW_AT)
+    return seq, stamp, obs, raw
+
+
+class HealthCollector:
+    def __init__(self, engine=None, interval=1.0, sample_pct=1.0, tables=TABLES, name=SHM_NAME):
+        self.engine = engine or get_engine()
+        self.interval = interval
+        self.sample_pct = sample_pct
+        self.tables = list(tables)
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=BLOCK_SIZE)
+        except FileExistsError:
+            # Left behind by a collector that did not shut down cleanly
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=BLOCK_SIZE)
+        _OWNED.add(self.shm.name)
+        self._seq, self._stamp, self._obs, self._raw = _views(self.shm.buf)
+        self._seq[0] = 0
+        self._statements = self._has_pg_stat_statements()
+        self._last_statements = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.samples = 0
+
+    def _has_pg_stat_statements(self):
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(STATEMENTS_QUERY, {"tables": self._table_regex()}).one()
+            return True
+        except Exception:
+            # Not installed, or not in shared_preload_libraries
+            return False
+
+    def _table_regex(self):
+        return r"\m(" + "|".join(self.tables) + r")\M"
+
+    # --- SAMPLING ---
+    def _sample_table(self, conn, table):
+        any_null = " OR ".join(f"{c} IS NULL" for c in NULL_COLUMNS)
+        return conn.execute(text(f"""
+            {TAG} SELECT count(*), count(*) FILTER (WHERE {any_null}),
+                   count(*) FILTER (WHERE spill_anomaly_flag = 1)
+            FROM {table} TABLESAMPLE SYSTEM (:pct)
+        """), {"pct": self.sample_pct}).one()
+
+    def collect(self):
+        """One measurement; returns (observation vector, raw metrics dict)."""
+        start = time.perf_counter()
+        raw = dict.fromkeys(RAW_FIELDS, 0.0)
+        with self.engine.connect() as conn:
+            scan_start = time.perf_counter()
+            for table in self.tables:
+                sampled, nulls, flagged = self._sample_table(conn, table)
+                raw["sampled_rows"] += sampled
+                raw["null_rows"] += nulls
+                raw["flagged_rows"] += flagged
+            scan_ms = (time.perf_counter() - scan_start) * 1000 / len(self.tables)
+
+            live, dead, seq_scans, idx_scans = conn.execute(TABLE_STATS_QUERY, {"tables": self.tables}).one()
+            raw["dead_tuple_ratio"] = dead / (live + dead) if live + dead else 0.0
+            raw["seq_scan_ratio"] = seq_scans / (seq_scans + idx_scans) if seq_scans + idx_scans else 0.0
+
+            query_ms = scan_ms
+            if self._statements:
+                calls, total_ms = conn.execute(STATEMENTS_QUERY, {"tables": self._table_regex()}).one()
+                if self._last_statements is not None:
+                    d_calls = calls - self._last_statements[0]
+                    d_ms = total_ms - self._last_statements[1]
+                    raw["statement_calls"] = d_calls
+                    if d_calls > 0:
+                        query_ms = d_ms / d_calls
+                self._last_statements = (calls, total_ms)
+            raw["statement_ms"] = query_ms
+
+        sampled = raw["sampled_rows"]
+        obs = np.array([
+            raw["null_rows"] / sampled if sampled else 0.0,
+            100.0 * raw["flagged_rows"] / sampled if sampled else 0.0,
+            query_ms,
+        ])
+        raw["collect_ms"] = (time.perf_counter() - start) * 1000
+        return np.clip(obs, 0.0, OBS_HIGH), raw
+
+    # --- PUBLISHING ---
+    def publish(self, obs, raw):
+        self._seq[0] += 1  # odd: write in progress
+        self._obs[:] = obs
+        self._raw[:] = [raw[f] for f in RAW_FIELDS]
+        self._stamp[0] = time.time()
+        self._seq[0] += 1  # even: consistent
+        self.samples += 1
+
+    def run(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.publish(*self.collect())
+            except Exception as exc:  # keep the last good vector published if the DB hiccups
+                print(f"⚠️ Health collection failed: {exc}")
+            self._stop.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="health-collector", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+        del self._seq, self._stamp, self._obs, self._raw
+        self.shm.close()
+        self.shm.unlink()
+        _OWNED.discard(self.shm.name)
+
+
+class HealthReader:
+    """Lock-free reader of the collector's shared-memory block."""
+
+    def __init__(self, name=SHM_NAME):
+        # Only the collector owns (and unlinks) the block; readers must not be tracked
+        try:
+            self.shm = shared_memory.SharedMemory(name, track=False)  # Python 3.13+
+        except TypeError:
+            self.shm = shared_memory.SharedMemory(name)
+            if self.shm.name not in _OWNED:
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+        self._seq, self._stamp, self._obs, self._raw = _views(self.shm.buf)
+
+    def read(self, retries=1000):
+        """(observation, raw metrics dict, timestamp) from one consistent snapshot."""
+        for _ in range(retries):
+            before = int(self._seq[0])
+            if before % 2 == 0:
+                obs, raw, stamp = self._obs.copy(), self._raw.copy(), float(self._stamp[0])
+                if int(self._seq[0]) == before:
+                    if before == 0:
+                        raise RuntimeError("The health collector has not published a sample yet.")
+                    return obs, dict(zip(RAW_FIELDS, raw.tolist())), stamp
+        raise RuntimeError("Could not read a consistent health snapshot.")
+
+    def observation(self):
+        return self.read()[0].astype(np.float32)
+
+    def age(self):
+        """Seconds since the last published sample."""
+        return time.time() - float(self._stamp[0])
+
+    def close(self):
+        del self._seq, self._stamp, self._obs, self._raw
+        self.shm.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish live database health for the agent.")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between samples")
+    parser.add_argument("--sample-pct", type=float, default=1.0, help="TABLESAMPLE SYSTEM percentage")
+    parser.add_argument("--name", default=SHM_NAME, help="shared memory block name")
+    parser.add_argument("--read", action="store_true", help="print the published vector instead of collecting")
+    parser.add_argument("--count", type=int, default=0, help="stop after N samples/reads (0 = run until Ctrl+C)")
+    args = parser.parse_args()
+
+    if args.read:
+        reader = HealthReader(args.name)
+        try:
+            n = 0
+            while not args.count or n < args.count:
+                obs, raw, _ = reader.read()
+                print(f"📈 {dict(zip(OBS_FIELDS, obs.round(4).tolist()))} (age {reader.age():.2f}s)")
+                n += 1
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+        reader.close()
+        raise SystemExit
+
+    collector = HealthCollector(interval=args.interval, sample_pct=args.sample_pct, name=args.name)
+    source = "pg_stat_statements" if collector._statements else "sampled scan latency"
+    print(f"🩺 Publishing health to shared memory '{args.name}' every {args.interval}s (query_time: {source})")
+    try:
+        while not args.count or collector.samples < args.count:
+            started = time.monotonic()
+            obs, raw = collector.collect()
+            collector.publish(obs, raw)
+            print(f"📈 {dict(zip(OBS_FIELDS, obs.round(4).tolist()))} in {raw['collect_ms']:.1f} ms")
+            time.sleep(max(0.0, args.interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        pass
+    collector.close()
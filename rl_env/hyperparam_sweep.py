@@ -0,0 +1,263 @@
+"""
+Script: hyperparam_sweep.py
+Purpose: Parallel hyperparameter sweep for the DQN healing agent with early stopping.
+
+Each trial trains `build_model(...)` from train_dqn_agent_realistic_v3.py with
+sampled overrides on the batched simulator (`VectorizedDatabaseHealingEnv`) in
+its own worker process. Every --eval-every timesteps the trial is evaluated on
+a fixed, seeded set of episodes (evaluate_agent_realistic_v3.run_episodes); it
+is pruned when its mean episode reward is below the median of the other trials
+at the same step (median pruning).
+
+Trials, intermediate values and final metrics go to a SQLite results store, so
+a sweep can be inspected while running and re-run under the same --study name
+to add trials.
+
+    python hyperparam_sweep.py --trials 64 --timesteps 20000
+    python hyperparam_sweep.py --report
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+RESULTS_DB = "sweep_results.sqlite"
+
+# Candidate values per hyperparameter (sampled uniformly)
+SEARCH_SPACE = {
+    "learning_rate": [3e-5, 1e-4, 3e-4, 1e-3],
+    "buffer_size": [5000, 10000, 50000, 100000],
+    "target_update_interval": [250, 500, 1000, 2000],
+    "exploration_fraction": [0.1, 0.2, 0.3, 0.5],
+    "net_arch": [[64, 64], [128, 128], [256, 256], [256, 256, 256]],
+}
+
+
+def sample_params(rng):
+    return {name: values[rng.integers(len(values))] for name, values in SEARCH_SPACE.items()}
+
+
+# --- RESULTS STORE ---
+class SweepStore:
+    """SQLite-backed trial records; safe to share between worker processes."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS trials (
+                trial_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                study TEXT NOT NULL,
+                params TEXT NOT NULL,
+                state TEXT NOT NULL,
+                value REAL,
+                metrics TEXT,
+                started REAL,
+                finished REAL
+            );
+            CREATE TABLE IF NOT EXISTS intermediate (
+                trial_id INTEGER NOT NULL,
+                step INTEGER NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (trial_id, step)
+            );
+        """)
+
+    def create_trial(self, study, params):
+        with self.conn:
+            cur = self.conn.execute(
+                "INSERT INTO trials (study, params, state) VALUES (?, ?, 'queued')",
+                (study, json.dumps(params)),
+            )
+        return cur.lastrowid
+
+    def start(self, trial_id):
+        with self.conn:
+            self.conn.execute("UPDATE trials SET state = 'running', started = ? WHERE trial_id = ?",
+                              (time.time(), trial_id))
+
+    def report(self, trial_id, step, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO intermediate VALUES (?, ?, ?)", (trial_id, step, value))
+
+    def peer_values(self, study, trial_id, step):
+        rows = self.conn.execute("""
+            SELECT i.value FROM intermediate i JOIN trials t USING (trial_id)
+            WHERE t.study = ? AND i.step = ? AND i.trial_id != ?
+        """, (study, step, trial_id)).fetchall()
+        return [r[0] for r in rows]
+
+    def finish(self, trial_id, state, value=None, metrics=None):
+        with self.conn:
+            self.conn.execute(
+                "UPDATE trials SET state = ?, value = ?, metrics = ?, finished = ? WHERE trial_id = ?",
+                (state, value, json.dumps(metrics) if metrics else None, time.time(), trial_id),
+            )
+
+    def trials(self, study):
+        return self.conn.execute(
+            "SELECT trial_id, params, state, value, metrics, started, finished FROM trials "
+            "WHERE study = ? ORDER BY trial_id", (study,)
+        ).fetchall()
+
+
+class MedianPruner:
+    def __init__(self, startup_trials=4, warmup_steps=0):
+        self.startup_trials = startup_trials
+        self.warmup_steps = warmup_steps
+
+    def should_prune(self, value, peer_values, step):
+        if step < self.warmup_steps or len(peer_values) < self.startup_trials:
+            return False
+        return value < np.median(peer_values)
+
+
+# --- TRIAL WORKER ---
+def trial_callback(trial_id, config, store, pruner, eval_env):
+    """Callback that evaluates every eval_every timesteps of one learn() call and stops pruned trials.
+
+    Training runs as a single learn(total_timesteps=timesteps), so the exploration
+    schedule spans the whole budget exactly as in train_dqn_agent_realistic_v3.py.
+    """
+    from evaluate_agent_realistic_v3 import run_episodes
+    from stable_baselines3.common.callbacks import BaseCallback
+
+    class TrialEvaluation(BaseCallback):
+        def __init__(self):
+            super().__init__()
+            self.next_eval = config["eval_every"]
+            self.stats = None
+            self.value = None
+            self.evaluated_at = None
+            self.pruned = False
+
+        def evaluate(self):
+            eval_env.seed(config["seed"])  # same evaluation episodes for every trial and step
+            self.stats = run_episodes(self.model, eval_env)
+            self.value = float(self.stats["reward"].mean())
+            self.evaluated_at = self.model.num_timesteps
+            return self.value
+
+        def _on_step(self):
+            if self.num_timesteps < self.next_eval:
+                return True
+            step = self.next_eval
+            while self.next_eval <= self.num_timesteps:
+                self.next_eval += config["eval_every"]
+            value = self.evaluate()
+            store.report(trial_id, step, value)
+            self.pruned = pruner.should_prune(value, store.peer_values(config["study"], trial_id, step), step)
+            return not self.pruned
+
+    return TrialEvaluation()
+
+
+def run_trial(trial_id, params, config, flags):
+    import torch
+    from evaluate_agent_realistic_v3 import aggregate
+    from train_dqn_agent_realistic_v3 import build_model
+    from vec_healing_env import VectorizedDatabaseHealingEnv
+
+    torch.set_num_threads(1)  # one core per trial; parallelism comes from the pool
+    store = SweepStore(config["db"])
+    store.start(trial_id)
+    pruner = MedianPruner(config["startup_trials"], config["warmup_steps"])
+
+    env = VectorizedDatabaseHealingEnv(config["num_envs"], anomaly_flags=flags, seed=config["seed"] + trial_id)
+    eval_env = VectorizedDatabaseHealingEnv(config["eval_episodes"], anomaly_flags=flags)
+    try:
+        model = build_model(env, seed=config["seed"] + trial_id, verbose=0, tensorboard_log=None, **params)
+        callback = trial_callback(trial_id, config, store, pruner, eval_env)
+        model.learn(total_timesteps=config["timesteps"], callback=callback)
+        if callback.pruned:
+            store.finish(trial_id, "pruned", callback.value)
+            return trial_id, "pruned", callback.value
+        if callback.evaluated_at is None or callback.evaluated_at < config["timesteps"]:
+            callback.evaluate()  # budget not a multiple of eval_every: score the final model
+        metrics = {m: float(v) for m, v in aggregate(callback.stats).items()}
+        store.finish(trial_id, "complete", callback.value, metrics)
+        return trial_id, "complete", callback.value
+    except Exception:
+        store.finish(trial_id, "failed")
+        raise
+    finally:
+        env.close()
+
+
+def load_flags(args):
+    if args.anomaly_rate is not None:
+        # DB-free sweep: synthetic flags at the given anomaly rate
+        return np.random.default_rng(args.seed).random(100_000) < args.anomaly_rate
+    from storage_backends import open_storage
+    storage = open_storage(args.storage)
+    flags = storage.load_flags()
+    storage.close()
+    if storage.engine is not None:
+        storage.engine.dispose()  # no pooled sockets for the trial workers to inherit
+    return flags.astype(bool)
+
+
+def print_report(store, study):
+    rows = store.trials(study)
+    done = [r for r in rows if r[6] is not None]
+    if not done:
+        print("No finished trials yet.")
+        return
+    hours = (max(r[6] for r in done) - min(r[5] for r in done)) / 3600
+    states = {s: sum(r[2] == s for r in rows) for s in ("complete", "pruned", "failed")}
+    print(f"📊 Study '{study}': {len(done)} finished ({states['complete']} complete, "
+          f"{states['pruned']} pruned, {states['failed']} failed) | {len(done) / max(hours, 1e-9):.1f} trials/hour")
+    complete = sorted((r for r in rows if r[2] == "complete"), key=lambda r: r[3], reverse=True)
+    for r in complete[:5]:
+        print(f"  #{r[0]} reward={r[3]:.2f} params={r[1]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel DQN hyperparameter sweep with median pruning.")
+    parser.add_argument("--study", default="dqn_v3")
+    parser.add_argument("--db", default=RESULTS_DB)
+    parser.add_argument("--trials", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--timesteps", type=int, default=20000, help="training budget per trial")
+    parser.add_argument("--eval-every", type=int, default=5000)
+    parser.add_argument("--eval-episodes", type=int, default=64)
+    parser.add_argument("--num-envs", type=int, default=8, help="vectorized envs per trial")
+    parser.add_argument("--startup-trials", type=int, default=4, help="peers needed at a step before pruning")
+    parser.add_argument("--warmup-steps", type=int, default=0, help="never prune before this many timesteps")
+    parser.add_argument("--anomaly-rate", type=float, default=None,
+                        help="use synthetic anomaly flags at this rate instead of loading them from Postgres")
+    parser.add_argument("--storage", default=None,
+                        help="episode storage URL to load flags from (default: $EPISODE_STORAGE_URL or Postgres)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", action="store_true", help="only print the results of --study")
+    args = parser.parse_args()
+
+    store = SweepStore(args.db)
+    if args.report:
+        print_report(store, args.study)
+        raise SystemExit
+
+    flags = load_flags(args)
+    config = {k: getattr(args, k) for k in ("study", "db", "timesteps", "eval_every", "eval_episodes",
+                                            "num_envs", "startup_trials", "warmup_steps", "seed")}
+    rng = np.random.default_rng(args.seed + len(store.trials(args.study)))
+
+    print(f"🚀 Running {args.trials} trials on {args.workers} workers (study '{args.study}')")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [pool.submit(run_trial, store.create_trial(args.study, params), params, config, flags)
+                   for params in (sample_params(rng) for _ in range(args.trials))]
+        for future in as_completed(futures):
+            try:
+                trial_id, state, value = future.result()
+                print(f"🔎 Trial #{trial_id} {state}: mean episode reward {value:.2f}")
+            except Exception as exc:
+                print(f"❌ Trial failed: {exc}")
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  {args.trials} trials in {elapsed:.0f}s ({args.trials * 3600 / elapsed:.1f} trials/hour)")
+    print_report(store, args.study)
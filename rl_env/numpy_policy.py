@@ -0,0 +1,141 @@
+"""
+Script: numpy_policy.py
+Purpose: Export the DQN q_net to a compact .npz and run it with NumPy alone.
+
+The trained policy is an MLP (8 -> 256 -> 256 -> 5, ReLU) with greedy argmax
+action selection, so consumers that only need decisions do not have to import
+stable_baselines3/torch or unpack the SB3 zip.
+
+Weights can be stored as float32, float16, or int8 with one scale per output
+channel (dequantized once at load, so inference always runs in float32).
+
+    python numpy_policy.py export [--model M] [--out policy.npz] [--quantize none|float16|int8]
+    python numpy_policy.py verify [--model M] [--npz policy.npz] [--samples 100000]
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+MODEL_PATH = "dqn_self_healing_model_realistic_v3"
+NPZ_PATH = "dqn_self_healing_policy_v3.npz"
+QUANTIZE_MODES = ["none", "float16", "int8"]
+
+
+# --- EXPORT ---
+def _linear_layers(model):
+    import torch.nn as nn
+    return [m for m in model.q_net.q_net if isinstance(m, nn.Linear)]
+
+
+def export_policy(model, out_path, quantize="none"):
+    """Write the q_net Linear layers of a loaded DQN (or a model path) to `out_path`."""
+    if isinstance(model, str):
+        from stable_baselines3 import DQN
+        model = DQN.load(model, device="cpu")
+
+    arrays = {"quantize": np.array(quantize)}
+    for i, layer in enumerate(_linear_layers(model)):
+        weight = layer.weight.detach().cpu().numpy().astype(np.float32)
+        arrays[f"b{i}"] = layer.bias.detach().cpu().numpy().astype(np.float32)
+        if quantize == "int8":
+            # Symmetric per-output-channel scale
+            scale = np.abs(weight).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            arrays[f"w{i}"] = np.round(weight / scale[:, None]).astype(np.int8)
+            arrays[f"s{i}"] = scale.astype(np.float32)
+        elif quantize == "float16":
+            arrays[f"w{i}"] = weight.astype(np.float16)
+        else:
+            arrays[f"w{i}"] = weight
+    np.savez(out_path, **arrays)
+    return out_path
+
+
+# --- INFERENCE ---
+class NumpyPolicy:
+    """Drop-in for `DQN.predict(obs, deterministic=True)` backed by exported weights."""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.quantize = str(data["quantize"])
+            self.layers = []
+            i = 0
+            while f"w{i}" in data:
+                weight = data[f"w{i}"].astype(np.float32)
+                if f"s{i}" in data:
+                    weight *= data[f"s{i}"][:, None]
+                # Stored (out, in) like torch; keep (in, out) for obs @ W
+                self.layers.append((np.ascontiguousarray(weight.T), data[f"b{i}"]))
+                i += 1
+
+    def q_values(self, obs):
+        x = np.asarray(obs, dtype=np.float32).reshape(-1, self.layers[0][0].shape[0])
+        for weight, bias in self.layers[:-1]:
+            x = x @ weight
+            x += bias
+            np.maximum(x, 0, out=x)
+        weight, bias = self.layers[-1]
+        return x @ weight + bias
+
+    def predict(self, obs, state=None, episode_start=None, deterministic=True):
+        obs = np.asarray(obs, dtype=np.float32)
+        actions = self.q_values(obs).argmax(axis=1)
+        return (actions if obs.ndim > 1 else actions[0]), state
+
+
+def load_policy(model_path=MODEL_PATH, npz_path=None):
+    """The NumPy policy when `npz_path` is given, otherwise the full SB3 model."""
+    if npz_path:
+        return NumpyPolicy(npz_path)
+    from stable_baselines3 import DQN
+    return DQN.load(model_path)
+
+
+# --- VERIFICATION ---
+def verify(model_path, npz_path, samples, seed=0):
+    """Compare greedy actions with `model.predict` on random in-range and env-visited observations."""
+    from stable_baselines3 import DQN
+    from healing_simulator import BatchedHealingSimulator
+
+    model = DQN.load(model_path, device="cpu")
+    policy = NumpyPolicy(npz_path)
+    rng = np.random.default_rng(seed)
+    space = model.observation_space
+
+    env = BatchedHealingSimulator(num_envs=1024, anomaly_flags=[False, True], seed=seed)
+    visited = [env.reset()]
+    for _ in range(env.max_steps - 1):
+        visited.append(env.step(model.predict(visited[-1], deterministic=True)[0])[0])
+    obs = np.concatenate([rng.uniform(space.low, space.high, (samples, space.shape[0])).astype(np.float32)]
+                         + visited)
+
+    expected, _ = model.predict(obs, deterministic=True)
+    actual, _ = policy.predict(obs)
+    q_ref = model.q_net(model.q_net.obs_to_tensor(obs)[0]).detach().numpy()
+    return {
+        "observations": len(obs),
+        "action_mismatches": int((expected != actual).sum()),
+        "max_q_error": float(np.abs(q_ref - policy.q_values(obs)).max()),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or verify the NumPy DQN policy.")
+    parser.add_argument("command", choices=["export", "verify"])
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--npz", "--out", dest="npz", default=NPZ_PATH)
+    parser.add_argument("--quantize", choices=QUANTIZE_MODES, default="none")
+    parser.add_argument("--samples", type=int, default=100_000)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_policy(args.model, args.npz, args.quantize)
+        print(f"✅ Exported {args.model} to {args.npz} ({args.quantize}, {os.path.getsize(args.npz)} bytes)")
+    else:
+        report = verify(args.model, args.npz, args.samples)
+        print(f"🔍 {report['observations']} observations: {report['action_mismatches']} action mismatches, "
+              f"max |ΔQ| = {report['max_q_error']:.2e}")
+        if report["action_mismatches"]:
+            raise SystemExit(1)
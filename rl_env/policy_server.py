@@ -0,0 +1,246 @@
+"""
+Script: policy_server.py
+Purpose: Long-running local inference service for the trained DQN healing policy.
+
+The model is loaded once; concurrent requests are micro-batched (up to
+--max-batch observations or --max-delay-ms after the first queued request,
+whichever comes first) into a single Q-network forward pass. Each response
+carries the greedy action and the Q-values.
+
+Transports:
+- HTTP:  POST /predict  {"obs": [8 floats] | [[8 floats], ...]}
+         GET  /metrics  -> latency p50/p99, throughput, batch sizes
+- Unix socket (--unix-socket PATH): one JSON object per line, same request
+  body as /predict, or {"op": "metrics"}.
+
+    python policy_server.py --port 8500
+    python policy_server.py --unix-socket /tmp/healing_policy.sock
+"""
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from numpy_policy import NumpyPolicy
+
+MODEL_PATH = "dqn_self_healing_model_realistic_v3"
+OBS_DIM = 8
+
+
+class Sb3QPolicy:
+    """Q-values straight from the SB3 q_net, skipping predict()'s per-call checks."""
+
+    def __init__(self, model_path):
+        import torch
+        from stable_baselines3 import DQN
+        self.torch = torch
+        self.model = DQN.load(model_path, device="cpu")
+        self.model.policy.set_training_mode(False)
+
+    def q_values(self, obs):
+        with self.torch.no_grad():
+            return self.model.q_net(self.torch.as_tensor(obs, dtype=self.torch.float32)).numpy()
+
+
+class _Request:
+    __slots__ = ("obs", "done", "q_values", "error", "submitted")
+
+    def __init__(self, obs):
+        self.obs = obs
+        self.done = threading.Event()
+        self.q_values = None
+        self.error = None
+        self.submitted = time.perf_counter()
+
+
+class MicroBatcher:
+    """Coalesces concurrent requests into one forward pass per deadline window."""
+
+    def __init__(self, policy, max_batch=256, max_delay=0.0005, window=10_000):
+        self.policy = policy
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._latencies = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.rows = 0
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def predict(self, obs, timeout=5.0):
+        obs = np.asarray(obs, dtype=np.float32).reshape(-1, OBS_DIM)
+        request = _Request(obs)
+        with self._cond:
+            self._queue.append(request)
+            self._cond.notify()
+        if not request.done.wait(timeout):
+            raise TimeoutError("policy inference timed out")
+        if request.error is not None:
+            raise request.error
+        return request.q_values.argmax(axis=1), request.q_values
+
+    def _collect(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0].submitted + self.max_delay
+            batch, rows = [], 0
+            while True:
+                while self._queue and rows < self.max_batch:
+                    request = self._queue.popleft()
+                    batch.append(request)
+                    rows += len(request.obs)
+                remaining = deadline - time.perf_counter()
+                if rows >= self.max_batch or remaining <= 0:
+                    return batch
+                self._cond.wait(remaining)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                q = self.policy.q_values(np.concatenate([r.obs for r in batch]))
+            except Exception as exc:
+                for r in batch:
+                    r.error = exc
+                    r.done.set()
+                continue
+            offset = 0
+            now = time.perf_counter()
+            for r in batch:
+                r.q_values = q[offset:offset + len(r.obs)]
+                offset += len(r.obs)
+                self._latencies.append(now - r.submitted)
+                r.done.set()
+            self._batch_sizes.append(len(q))
+            self.requests += len(batch)
+            self.rows += len(q)
+
+    def metrics(self):
+        latencies = np.array(self._latencies) * 1000
+        elapsed = time.perf_counter() - self.started
+        return {
+            "requests": self.requests,
+            "observations": self.rows,
+            "requests_per_second": self.requests / elapsed,
+            "latency_ms_p50": float(np.percentile(latencies, 50)) if latencies.size else None,
+            "latency_ms_p99": float(np.percentile(latencies, 99)) if latencies.size else None,
+            "mean_batch_size": float(np.mean(self._batch_sizes)) if self._batch_sizes else None,
+        }
+
+
+def handle_message(batcher, message):
+    if not isinstance(message, dict):
+        raise ValueError("request must be a JSON object")
+    if message.get("op") == "metrics":
+        return batcher.metrics()
+    actions, q_values = batcher.predict(message["obs"])
+    return {"actions": actions.tolist(), "q_values": q_values.tolist()}
+
+
+def error_status(exc):
+    """HTTP status for a failed request: bad input, overloaded batcher, or a server fault."""
+    if isinstance(exc, TimeoutError):
+        return 503
+    if isinstance(exc, (ValueError, KeyError, TypeError)):
+        return 400
+    return 500
+
+
+# --- HTTP TRANSPORT ---
+def make_http_handler(batcher):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._reply(200, batcher.metrics())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                self._reply(200, handle_message(batcher, body))
+            except Exception as exc:
+                self._reply(error_status(exc), {"error": str(exc) or type(exc).__name__})
+
+        def log_message(self, *args):
+            pass  # per-request access logs would dominate latency
+
+    return Handler
+
+
+# --- UNIX SOCKET TRANSPORT ---
+def make_unix_handler(batcher):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    reply = handle_message(batcher, json.loads(line))
+                except Exception as exc:  # reply and keep serving the stream
+                    reply = {"error": str(exc) or type(exc).__name__, "status": error_status(exc)}
+                self.wfile.write(json.dumps(reply).encode() + b"\n")
+                self.wfile.flush()
+
+    return Handler
+
+
+def request_unix(path, obs):
+    """Minimal client: one decision over the Unix socket transport."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps({"obs": np.asarray(obs).tolist()}).encode() + b"\n")
+        return json.loads(sock.makefile().readline())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the DQN healing policy.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--npz", default=None, help="serve an exported NumPy policy (no torch import)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8500)
+    parser.add_argument("--unix-socket", default=None, help="serve on this Unix socket instead of HTTP")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-delay-ms", type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"🧠 Loading {args.npz or args.model}...")
+    policy = NumpyPolicy(args.npz) if args.npz else Sb3QPolicy(args.model)
+    batcher = MicroBatcher(policy, args.max_batch, args.max_delay_ms / 1000)
+
+    if args.unix_socket:
+        if os.path.exists(args.unix_socket):
+            os.remove(args.unix_socket)
+        server = socketserver.ThreadingUnixStreamServer(args.unix_socket, make_unix_handler(batcher))
+        print(f"🚀 Serving on unix://{args.unix_socket}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), make_http_handler(batcher))
+        print(f"🚀 Serving on http://{args.host}:{args.port}")
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,147 @@
+"""
+Script: replay_checkpoint.py
+Purpose: Checkpoint the DQN model together with its replay buffer, and warm-start
+training from a checkpoint or from logged production transitions.
+
+Checkpoint layout (one directory):
+    model.zip          SB3 model (weights, optimizer, schedules, num_timesteps)
+    <array>.npy        replay buffer arrays, only the filled rows
+    meta.json          buffer position/fill state and array shapes
+
+Loading copies the saved rows into the buffer's own arrays, so nothing stays
+mapped to the checkpoint files. Every file is written to a temporary path and
+moved into place, so saving over the checkpoint a run resumed from (or a crash
+mid-save) never leaves a truncated file behind.
+"""
+
+import json
+import os
+
+import numpy as np
+from stable_baselines3 import DQN
+from stable_baselines3.common.callbacks import BaseCallback
+
+from action_log import NEXT_STATE_COLUMNS, STATE_COLUMNS, read_action_log
+
+BUFFER_ARRAYS = ["observations", "next_observations", "actions", "rewards", "dones", "timeouts"]
+
+
+def _replace(path, write):
+    """Write `path` via `write(tmp_path)` and an atomic rename."""
+    base, ext = os.path.splitext(path)
+    tmp = f"{base}.tmp{ext}"
+    write(tmp)
+    os.replace(tmp, path)
+
+
+# --- REPLAY BUFFER ---
+def _filled_rows(buffer):
+    return buffer.buffer_size if buffer.full else buffer.pos
+
+
+def save_replay_buffer(buffer, directory):
+    os.makedirs(directory, exist_ok=True)
+    rows = _filled_rows(buffer)
+    shapes = {}
+    for name in BUFFER_ARRAYS:
+        array = getattr(buffer, name, None)
+        if array is None:  # next_observations with optimize_memory_usage
+            continue
+        _replace(os.path.join(directory, f"{name}.npy"), lambda tmp: np.save(tmp, array[:rows]))
+        shapes[name] = list(array[:rows].shape)
+    meta = {"pos": buffer.pos, "full": buffer.full, "rows": rows,
+            "buffer_size": buffer.buffer_size, "n_envs": buffer.n_envs, "shapes": shapes}
+
+    def write_meta(tmp):
+        with open(tmp, "w") as f:
+            json.dump(meta, f, indent=2)
+
+    _replace(os.path.join(directory, "meta.json"), write_meta)
+
+
+def load_replay_buffer(buffer, directory):
+    """Restore saved transitions into `buffer`; returns the number of transitions restored."""
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="c") for name in meta["shapes"]}
+
+    if meta["n_envs"] == buffer.n_envs and meta["buffer_size"] == buffer.buffer_size:
+        # Same layout: copy the rows in (the buffer must not alias the files it may later overwrite)
+        for name, array in arrays.items():
+            getattr(buffer, name)[:meta["rows"]] = array
+        buffer.pos, buffer.full = meta["pos"], meta["full"]
+        return meta["rows"] * meta["n_envs"]
+
+    # Different layout: replay the transitions oldest-first into the new buffer
+    order = np.roll(np.arange(meta["rows"]), -meta["pos"]) if meta["full"] else np.arange(meta["rows"])
+    flat = {name: array[order].reshape(-1, *array.shape[2:]) for name, array in arrays.items()}
+    if "next_observations" not in flat:
+        raise ValueError("Checkpoint was saved with optimize_memory_usage; buffer layouts must match.")
+    return fill_replay_buffer(buffer, flat["observations"], flat["next_observations"], flat["actions"],
+                              flat["rewards"], flat["dones"], flat.get("timeouts"))
+
+
+def fill_replay_buffer(buffer, obs, next_obs, actions, rewards, dones, timeouts=None):
+    """Write flat transitions into `buffer`, filling whole rows of n_envs transitions at a time."""
+    n_envs = buffer.n_envs
+    rows = min(len(obs) // n_envs, buffer.buffer_size)
+    count = rows * n_envs
+    if rows == 0:
+        return 0
+    start = len(obs) - count  # keep the newest transitions
+
+    def block(values, shape):
+        return np.asarray(values[start:], dtype=np.float32).reshape(rows, n_envs, *shape)
+
+    buffer.observations[:rows] = block(obs, buffer.obs_shape)
+    buffer.next_observations[:rows] = block(next_obs, buffer.obs_shape)
+    buffer.actions[:rows] = block(actions, (buffer.action_dim,))
+    buffer.rewards[:rows] = block(rewards, ())
+    buffer.dones[:rows] = block(dones, ())
+    buffer.timeouts[:rows] = 0 if timeouts is None else block(timeouts, ())
+    buffer.pos = rows % buffer.buffer_size
+    buffer.full = rows == buffer.buffer_size
+    return count
+
+
+def seed_from_action_log(model, log_path):
+    """Fill the replay buffer with (state, action, reward, next_state) rows from an agent log."""
+    df = read_action_log(log_path).dropna(subset=NEXT_STATE_COLUMNS)
+    if df.empty:
+        raise ValueError(f"{log_path} has no transitions with next_* state columns.")
+    count = fill_replay_buffer(
+        model.replay_buffer,
+        df[STATE_COLUMNS].to_numpy(), df[NEXT_STATE_COLUMNS].to_numpy(),
+        df["action_id"].to_numpy(), df["reward"].to_numpy(), np.zeros(len(df)),
+    )
+    # Start gradient updates as soon as the seeded buffer covers learning_starts
+    model.learning_starts = max(0, model.learning_starts - count)
+    return count
+
+
+# --- MODEL + BUFFER CHECKPOINTS ---
+def save_checkpoint(model, directory):
+    os.makedirs(directory, exist_ok=True)
+    _replace(os.path.join(directory, "model.zip"), model.save)
+    save_replay_buffer(model.replay_buffer, directory)
+
+
+def load_checkpoint(directory, env, **kwargs):
+    """Load model and replay buffer; continue with `model.learn(..., reset_num_timesteps=False)`."""
+    model = DQN.load(os.path.join(directory, "model"), env=env, **kwargs)
+    restored = load_replay_buffer(model.replay_buffer, directory)
+    return model, restored
+
+
+class ReplayCheckpointCallback(BaseCallback):
+    """Save model + replay buffer every `save_freq` calls to `env.step()`."""
+
+    def __init__(self, directory, save_freq):
+        super().__init__()
+        self.directory = directory
+        self.save_freq = save_freq
+
+    def _on_step(self):
+        if self.n_calls % self.save_freq == 0:
+            save_checkpoint(self.model, self.directory)
+        return True
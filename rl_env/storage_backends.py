@@ -0,0 +1,303 @@
+"""
+Script: storage_backends.py
+Purpose: Where episode seeds (`stream_buffer.spill_anomaly_flag`) come from.
+
+Every backend implements the same sampling interface used by `EpisodeSampler`:
+- sample(n, rng) -> int8 array of n flags drawn at random
+- load_flags()   -> int8 array of every flag
+- in_memory      -> True when sampling is a local array lookup (no refill thread needed)
+
+Backends, selected by URL (argument, or the EPISODE_STORAGE_URL environment
+variable; PostgreSQL via db_session when neither is set):
+    postgresql+psycopg2://...      live server, TABLESAMPLE / key-range draws
+    sqlite:///stream_buffer.sqlite embedded SQLite file, random rowid draws
+    duckdb:///stream_buffer.duckdb embedded DuckDB file, reservoir sampling
+    arrow:///stream_buffer.parquet Parquet/Arrow file loaded into memory
+
+`export_snapshot` writes a file snapshot of `stream_buffer` for the embedded
+backends, so local and CI runs can train without a server:
+    python storage_backends.py export sqlite:///stream_buffer.sqlite
+    python storage_backends.py bench arrow:///stream_buffer.parquet
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_integration"))
+from db_session import PreparedQuery, get_engine  # noqa: E402
+
+STORAGE_ENV = "EPISODE_STORAGE_URL"
+TABLE = "stream_buffer"
+FLAG_COLUMN = "spill_anomaly_flag"
+
+# --- POSTGRES SAMPLING QUERIES ---
+# Run on every refill, so they are prepared once per pooled connection
+COUNT_QUERY = PreparedQuery("SELECT reltuples::bigint FROM pg_class WHERE oid = 'stream_buffer'::regclass")
+# SYSTEM returns sampled pages in physical order; shuffle before LIMIT so the cut
+# does not always keep the lowest pages (and never reach newly streamed rows)
+TABLESAMPLE_QUERY = PreparedQuery("""
+    SELECT spill_anomaly_flag FROM (
+        SELECT spill_anomaly_flag FROM stream_buffer TABLESAMPLE SYSTEM ($1)
+    ) s
+    ORDER BY random()
+    LIMIT $2
+""", ("real", "bigint"))
+KEY_RANGE_QUERY = PreparedQuery("""
+    SELECT spill_anomaly_flag FROM stream_buffer
+    WHERE spill_number >= (
+        SELECT min(spill_number) + (max(spill_number) - min(spill_number)) * $1
+        FROM stream_buffer
+    )
+    ORDER BY spill_number
+    LIMIT $2
+""", ("double precision", "bigint"))
+FALLBACK_QUERY = PreparedQuery("SELECT spill_anomaly_flag FROM stream_buffer ORDER BY RANDOM() LIMIT $1", ("bigint",))
+
+
+def _flags(values):
+    return np.array([bool(v) for v in values], dtype=np.int8)
+
+
+def _file_path(url):
+    """Path part of scheme:///path (relative) or scheme:////abs/path URLs."""
+    return url.split(":///", 1)[1]
+
+
+class PostgresStorage:
+    in_memory = False
+
+    def __init__(self, engine=None, method="tablesample"):
+        if method not in ("tablesample", "key_range"):
+            raise ValueError(f"Unknown sampling method: {method}")
+        self.engine = engine or get_engine()
+        self.method = method
+
+    def sample(self, n, rng):
+        with self.engine.connect() as conn:
+            if self.method == "tablesample":
+                estimated = COUNT_QUERY.execute(conn).scalar() or 0
+                if estimated > 0:
+                    # Oversample a little: SYSTEM sampling works on whole pages.
+                    pct = min(100.0, 100.0 * 2 * n / estimated)
+                    rows = TABLESAMPLE_QUERY.execute(conn, pct, n).fetchall()
+                else:
+                    # Table never analyzed; reltuples is unknown.
+                    rows = FALLBACK_QUERY.execute(conn, n).fetchall()
+            else:
+                rows = []
+                for u in rng.random(max(1, n // 64)):
+                    rows.extend(KEY_RANGE_QUERY.execute(conn, float(u), 64).fetchall())
+        return _flags(r[0] for r in rows)
+
+    def load_flags(self):
+        with self.engine.connect() as conn:
+            rows = conn.execute(text(f"SELECT {FLAG_COLUMN} FROM {TABLE}")).fetchall()
+        return _flags(r[0] for r in rows)
+
+    def close(self):
+        pass  # the pooled engine is shared process-wide
+
+
+class SQLiteStorage:
+    in_memory = False
+
+    def __init__(self, path):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"SQLite snapshot not found: {path}")
+        self.path = path
+        self.engine = None
+        # One connection per thread (the sampler refills from a background thread)
+        self._local = threading.local()
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False only so close() can close other threads' connections
+            conn = self._local.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                                                      check_same_thread=False)
+            with self._lock:
+                self._opened.append(conn)
+        return conn
+
+    def sample(self, n, rng):
+        conn = self._conn()
+        lo, hi = conn.execute(f"SELECT min(rowid), max(rowid) FROM {TABLE}").fetchone()
+        if lo is None:
+            return np.empty(0, dtype=np.int8)
+        # Uniform rowid draws; misses (deleted rows) are simply fewer flags this batch
+        ids = rng.integers(lo, hi + 1, n).tolist()
+        placeholders = ",".join("?" * len(ids))
+        found = dict(conn.execute(f"SELECT rowid, {FLAG_COLUMN} FROM {TABLE} WHERE rowid IN ({placeholders})", ids))
+        return _flags(found[i] for i in ids if i in found)
+
+    def load_flags(self):
+        return _flags(r[0] for r in self._conn().execute(f"SELECT {FLAG_COLUMN} FROM {TABLE}"))
+
+    def close(self):
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for conn in opened:
+            conn.close()
+        self._local = threading.local()
+
+
+class DuckDBStorage:
+    in_memory = False
+
+    def __init__(self, path):
+        import duckdb  # optional dependency, only needed for this backend
+
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"DuckDB snapshot not found: {path}")
+        self.engine = None
+        self.conn = duckdb.connect(path, read_only=True)
+
+    def sample(self, n, rng):
+        # DuckDB connections are not thread-safe; each call gets its own cursor
+        seed = int(rng.integers(0, 2**31 - 1))
+        rows = self.conn.cursor().execute(
+            f"SELECT {FLAG_COLUMN} FROM {TABLE} USING SAMPLE reservoir({int(n)} ROWS) REPEATABLE ({seed})"
+        ).fetchall()
+        return _flags(r[0] for r in rows)
+
+    def load_flags(self):
+        return _flags(r[0] for r in self.conn.cursor().execute(f"SELECT {FLAG_COLUMN} FROM {TABLE}").fetchall())
+
+    def close(self):
+        self.conn.close()
+
+
+class ArrowStorage:
+    """Flags from a Parquet/Arrow file (or an in-memory array), sampled locally."""
+
+    in_memory = True
+
+    def __init__(self, path=None, flags=None):
+        self.engine = None
+        if flags is None:
+            import pyarrow as pa
+            import pyarrow.feather as feather
+            import pyarrow.parquet as pq
+
+            if path.endswith((".arrow", ".feather")):
+                column = feather.read_table(path, columns=[FLAG_COLUMN], memory_map=True)[FLAG_COLUMN]
+            else:
+                column = pq.read_table(path, columns=[FLAG_COLUMN], memory_map=True)[FLAG_COLUMN]
+            # int8 first: boolean columns cannot be filled with 0
+            flags = column.cast(pa.int8()).fill_null(0).to_numpy()
+        self.flags = np.asarray(flags).astype(bool).astype(np.int8)
+
+    def sample(self, n, rng):
+        return self.flags[rng.integers(0, self.flags.size, n)] if self.flags.size else self.flags
+
+    def load_flags(self):
+        return self.flags
+
+    def close(self):
+        pass
+
+
+def open_storage(url=None, **kwargs):
+    """Backend for `url`, else $EPISODE_STORAGE_URL, else the shared PostgreSQL engine."""
+    url = url or os.environ.get(STORAGE_ENV)
+    if not url:
+        return PostgresStorage(**kwargs)
+    if url.startswith("postgresql"):
+        return PostgresStorage(get_engine(url), **kwargs)
+    if url.startswith("sqlite:///"):
+        return SQLiteStorage(_file_path(url))
+    if url.startswith("duckdb:///"):
+        return DuckDBStorage(_file_path(url))
+    if url.startswith(("arrow:///", "parquet:///")):
+        return ArrowStorage(_file_path(url))
+    raise ValueError(f"Unsupported episode storage URL: {url}")
+
+
+# --- SNAPSHOT EXPORT ---
+def export_snapshot(url, engine=None, table=TABLE, chunksize=100_000):
+    """Copy `table` from PostgreSQL into the file backend named by `url`; returns rows written."""
+    engine = engine or get_engine()
+    path = _file_path(url)
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    rows = 0
+    with engine.connect().execution_options(stream_results=True) as conn:
+        chunks = pd.read_sql(text(f"SELECT * FROM {table}"), conn, chunksize=chunksize)
+        if url.startswith("sqlite:///"):
+            out = sqlite3.connect(tmp)
+            for chunk in chunks:
+                chunk.to_sql(table, out, if_exists="append", index=False)
+                rows += len(chunk)
+            out.commit()
+            out.close()
+        elif url.startswith("duckdb:///"):
+            import duckdb
+
+            out = duckdb.connect(tmp)
+            for chunk in chunks:
+                out.register("chunk", chunk)
+                if rows == 0:
+                    out.execute(f"CREATE TABLE {table} AS SELECT * FROM chunk")
+                else:
+                    out.execute(f"INSERT INTO {table} SELECT * FROM chunk")
+                out.unregister("chunk")
+                rows += len(chunk)
+            out.close()
+        elif url.startswith(("arrow:///", "parquet:///")):
+            import pyarrow as pa
+            import pyarrow.feather as feather
+            import pyarrow.parquet as pq
+
+            tables = []
+            for chunk in chunks:
+                tables.append(pa.Table.from_pandas(chunk, preserve_index=False))
+                rows += len(chunk)
+            snapshot = pa.concat_tables(tables, promote_options="permissive")
+            if path.endswith((".arrow", ".feather")):
+                feather.write_feather(snapshot, tmp)
+            else:
+                pq.write_table(snapshot, tmp)
+        else:
+            raise ValueError(f"Can only export to sqlite:///, duckdb:/// or arrow:/// files, not {url}")
+    os.replace(tmp, path)
+    return rows
+
+
+def bench(storage, draws=200, n=512, seed=0):
+    """Mean milliseconds per sample() call of `n` flags."""
+    rng = np.random.default_rng(seed)
+    storage.sample(n, rng)  # warm-up (connection, page cache)
+    start = time.perf_counter()
+    for _ in range(draws):
+        storage.sample(n, rng)
+    return (time.perf_counter() - start) / draws * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or benchmark episode storage backends.")
+    parser.add_argument("command", choices=["export", "bench"])
+    parser.add_argument("urls", nargs="+", help="storage URLs (export: target files)")
+    args = parser.parse_args()
+
+    for url in args.urls:
+        if args.command == "export":
+            start = time.perf_counter()
+            rows = export_snapshot(url)
+            print(f"📦 Exported {rows} rows of {TABLE} to {url} in {time.perf_counter() - start:.2f}s")
+        else:
+            storage = open_storage(url)
+            flags = storage.load_flags()
+            print(f"⏱️  {url}: {bench(storage):.3f} ms per 512-flag draw "
+                  f"({flags.size} rows, {flags.mean():.1%} anomalous)")
+            storage.close()
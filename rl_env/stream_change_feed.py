@@ -0,0 +1,194 @@
+"""
+Script: stream_change_feed.py
+Purpose: Incremental change feed over `stream_buffer`.
+
+Every row gets a monotonically increasing `stream_seq` (BIGSERIAL) watermark,
+and a statement-level AFTER INSERT trigger sends `pg_notify` on the
+`stream_buffer_changes` channel. `ChangeFeed` LISTENs on that channel, and on
+every notification (or every `poll_interval` seconds, in case one was missed)
+fetches only rows past its watermark, delivering them to subscribers as
+DataFrame batches.
+
+`stream_seq` order equals commit order as long as inserts come from a single
+writer (the stream simulator commits one micro-batch per transaction).
+
+`InMemoryChangeFeed` has the same subscribe/poll/run interface without a
+database, for tests and offline runs.
+"""
+
+import os
+import select
+import sys
+import threading
+
+import pandas as pd
+from sqlalchemy import text
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data_integration"))
+from db_session import PreparedQuery  # noqa: E402
+
+CHANNEL = "stream_buffer_changes"
+STREAM_TABLE = "stream_buffer"
+
+
+def ensure_change_feed(engine, table=STREAM_TABLE, channel=CHANNEL):
+    """Add the stream_seq column, its index and the NOTIFY trigger if they are missing."""
+    with engine.begin() as conn:
+        has_column = conn.execute(text("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = :t AND column_name = 'stream_seq'
+        """), {"t": table}).first()
+        if not has_column:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN stream_seq BIGSERIAL"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {table}_stream_seq_idx ON {table} (stream_seq)"))
+
+        has_trigger = conn.execute(text("""
+            SELECT 1 FROM pg_trigger WHERE tgname = :name AND tgrelid = CAST(:t AS regclass)
+        """), {"name": f"{table}_notify", "t": table}).first()
+        if not has_trigger:
+            conn.execute(text(f"""
+                CREATE OR REPLACE FUNCTION {table}_notify() RETURNS trigger AS $$
+                BEGIN
+                    PERFORM pg_notify('{channel}', (SELECT max(stream_seq)::text FROM new_rows));
+                    RETURN NULL;
+                END;
+                $$ LANGUAGE plpgsql;
+
+                CREATE TRIGGER {table}_notify
+                AFTER INSERT ON {table}
+                REFERENCING NEW TABLE AS new_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION {table}_notify();
+            """))
+
+
+class _Feed:
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.subscribers = []
+        self.delivered = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """`callback(df)` is called with each batch of new rows, in stream_seq order."""
+        self.subscribers.append(callback)
+        return callback
+
+    def _deliver(self, batch):
+        for callback in self.subscribers:
+            callback(batch)
+        self.delivered += len(batch)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.run, name="change-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+class ChangeFeed(_Feed):
+    """LISTEN/NOTIFY-driven consumer of rows appended to `stream_buffer`."""
+
+    def __init__(self, engine, after=None, batch_size=500, poll_interval=1.0,
+                 table=STREAM_TABLE, channel=CHANNEL, columns=None):
+        super().__init__(batch_size)
+        self.engine = engine
+        self.table = table
+        self.channel = channel
+        self.poll_interval = poll_interval
+        ensure_change_feed(engine, table, channel)
+        projection = "*" if columns is None else ", ".join(dict.fromkeys(list(columns) + ["stream_seq"]))
+        self._query = PreparedQuery(f"SELECT {projection} FROM {table} WHERE stream_seq > $1 ORDER BY stream_seq LIMIT $2",
+                                    ("bigint", "bigint"))
+        if after is None:
+            # Only rows streamed from now on
+            with engine.connect() as conn:
+                after = conn.execute(text(f"SELECT coalesce(max(stream_seq), 0) FROM {table}")).scalar()
+        self.watermark = after
+
+    def poll(self):
+        """Deliver everything past the watermark; returns the number of rows delivered."""
+        total = 0
+        with self.engine.connect() as conn:
+            while True:
+                result = self._query.execute(conn, self.watermark, self.batch_size)
+                batch = pd.DataFrame.from_records(result.fetchall(), columns=list(result.keys()), coerce_float=True)
+                if batch.empty:
+                    return total
+                self._deliver(batch)
+                self.watermark = int(batch["stream_seq"].iloc[-1])
+                total += len(batch)
+                if len(batch) < self.batch_size:
+                    return total
+
+    def run(self):
+        listener = self.engine.raw_connection()
+        dbapi_conn = listener.dbapi_connection
+        # LISTEN + autocommit must not leak back into the shared pool
+        listener.detach()
+        try:
+            dbapi_conn.autocommit = True
+            with dbapi_conn.cursor() as cur:
+                cur.execute(f"LISTEN {self.channel}")
+            self.poll()
+            while not self._stop.is_set():
+                ready, _, _ = select.select([dbapi_conn], [], [], self.poll_interval)
+                if ready:
+                    dbapi_conn.poll()
+                    notified = max((int(n.payload) for n in dbapi_conn.notifies if n.payload), default=None)
+                    dbapi_conn.notifies.clear()
+                    if notified is not None and notified <= self.watermark:
+                        continue
+                self.poll()
+        finally:
+            listener.close()
+
+
+class InMemoryChangeFeed(_Feed):
+    """In-process stand-in for `ChangeFeed`: `append()` rows, subscribers receive them in batches."""
+
+    def __init__(self, batch_size=500, poll_interval=1.0):
+        super().__init__(batch_size)
+        self.poll_interval = poll_interval
+        self.watermark = 0
+        self._rows = []
+        self._next_seq = 1
+        self._cond = threading.Condition()
+
+    def append(self, df):
+        df = df.copy()
+        with self._cond:
+            df["stream_seq"] = range(self._next_seq, self._next_seq + len(df))
+            self._next_seq += len(df)
+            self._rows.append(df)
+            self._cond.notify_all()
+
+    def poll(self):
+        with self._cond:
+            pending = pd.concat(self._rows, ignore_index=True) if self._rows else None
+            self._rows = []
+        if pending is None:
+            return 0
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending.iloc[start:start + self.batch_size]
+            self._deliver(batch)
+            self.watermark = int(batch["stream_seq"].iloc[-1])
+        return len(pending)
+
+    def run(self):
+        while not self._stop.is_set():
+            with self._cond:
+                if not self._rows:
+                    self._cond.wait(self.poll_interval)
+            self.poll()
+
+    def close(self):
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
@@ -1,14 +1,15 @@
-
 """
 Script: test_env_random_agent.py
-Purpose: Run the DatabaseHealingEnv using random actions for basic validation.
+Purpose: Run RealisticDatabaseHealingEnvV3 using random actions for basic validation.
 
-Make sure database_healing_env.py is in the Python path.
+Episodes are seeded from an in-memory anomaly flag array by default, so no
+database is needed; pass --db to sample them from `stream_buffer` instead, or
+--health to start from the live vector published by health_collector.py.
 
 Author: Khondaker Zahin Fuad
 """
 
-import gym
+import argparse
 import numpy as np
 import sys
 import os
@@ -16,26 +17,44 @@ import os
 # Ensure the custom environment can be imported
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database_healing_env import DatabaseHealingEnv
-
-# --- Initialize Environment ---
-env = DatabaseHealingEnv()
-obs = env.reset()
-
-print("\n🎮 Starting Random Agent Test")
-print("-----------------------------")
-
-total_reward = 0
-for step in range(30):
-    action = env.action_space.sample()
-    obs, reward, done, _ = env.step(action)
-    total_reward += reward
-
-    print(f"Step {step+1}: Action={action}, Reward={reward}, State={obs.tolist()}")
-
-    if done:
-        print("\n✅ Environment reached terminal state (anomalies resolved).")
-        break
-
-print(f"🎯 Total Reward: {total_reward}")
-env.close()
+from database_healing_env_realistic_v3 import RealisticDatabaseHealingEnvV3  # noqa: E402
+from episode_sampler import EpisodeSampler  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Random-action smoke test for the healing environment.")
+    parser.add_argument("--db", action="store_true", help="sample episodes from stream_buffer")
+    parser.add_argument("--health", action="store_true", help="start from the running health collector's observation")
+    parser.add_argument("--anomaly-rate", type=float, default=0.5, help="share of anomalous episodes without --db")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    # --- Initialize Environment ---
+    if args.db or args.health:
+        env = RealisticDatabaseHealingEnvV3(health=args.health or None)
+    else:
+        flags = np.random.default_rng(args.seed).random(1000) < args.anomaly_rate
+        env = RealisticDatabaseHealingEnvV3(sampler=EpisodeSampler.from_flags(flags, seed=args.seed))
+    obs, info = env.reset(seed=args.seed)
+    env.action_space.seed(args.seed)
+
+    print("\n🎮 Starting Random Agent Test")
+    print("-----------------------------")
+    print(f"Anomaly present: {env.anomaly_present}")
+
+    total_reward = 0
+    for step in range(env.max_steps):
+        action = env.action_space.sample()
+        obs, reward, terminated, truncated, info = env.step(action)
+        total_reward += reward
+
+        print(f"Step {step+1}: Action={action}, Reward={reward}, State={obs.tolist()}")
+
+        if terminated:
+            print("\n✅ Environment reached terminal state (anomalies resolved).")
+            break
+        if truncated:
+            print("\n⌛ Episode truncated at the step limit.")
+            break
+
+    print(f"🎯 Total Reward: {total_reward}")
+    env.close()
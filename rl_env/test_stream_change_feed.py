@@ -0,0 +1,129 @@
+"""
+Tests for stream_change_feed.py.
+
+The in-memory feed tests need no database; the ChangeFeed test runs against
+the configured PostgreSQL server (LOGISTICS_DB_URL) and is skipped without one.
+
+    python -m pytest rl_env/test_stream_change_feed.py
+"""
+
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from stream_change_feed import ChangeFeed, InMemoryChangeFeed
+
+
+def rows(start, n):
+    return pd.DataFrame({"spill_number": range(start, start + n)})
+
+
+def collect(feed):
+    batches = []
+    feed.subscribe(batches.append)
+    return batches
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+# --- IN-MEMORY FEED ---
+def test_poll_delivers_batches_in_order_and_advances_watermark():
+    feed = InMemoryChangeFeed(batch_size=4)
+    batches = collect(feed)
+    feed.append(rows(0, 6))
+    feed.append(rows(6, 3))
+
+    assert feed.poll() == 9
+    assert [len(b) for b in batches] == [4, 4, 1]
+    delivered = pd.concat(batches)
+    assert delivered["spill_number"].tolist() == list(range(9))
+    assert delivered["stream_seq"].tolist() == list(range(1, 10))
+    assert feed.watermark == 9
+    assert feed.delivered == 9
+
+
+def test_poll_only_delivers_rows_past_the_watermark():
+    feed = InMemoryChangeFeed(batch_size=10)
+    batches = collect(feed)
+    feed.append(rows(0, 3))
+    feed.poll()
+    assert feed.poll() == 0  # nothing new
+
+    feed.append(rows(3, 2))
+    assert feed.poll() == 2
+    assert batches[-1]["stream_seq"].tolist() == [4, 5]
+    assert feed.watermark == 5
+
+
+def test_running_feed_wakes_on_append():
+    feed = InMemoryChangeFeed(batch_size=100, poll_interval=10.0).start()
+    try:
+        batches = collect(feed)
+        started = time.monotonic()
+        feed.append(rows(0, 5))
+        assert wait_for(lambda: feed.delivered == 5)
+        # Woken by the append, not by the 10 s poll interval
+        assert time.monotonic() - started < 5.0
+        assert feed.watermark == 5
+        assert pd.concat(batches)["spill_number"].tolist() == list(range(5))
+    finally:
+        feed.close()
+
+
+# --- POSTGRES FEED ---
+@pytest.fixture
+def pg_table():
+    from db_session import get_engine
+
+    engine = get_engine()
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except OperationalError:
+        pytest.skip("PostgreSQL is not reachable")
+    table = f"feed_test_{uuid.uuid4().hex[:8]}"
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE {table} (spill_number bigint)"))
+    yield engine, table
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+        conn.execute(text(f"DROP FUNCTION IF EXISTS {table}_notify()"))
+
+
+def test_change_feed_delivers_inserts_without_leaking_listen_into_the_pool(pg_table):
+    engine, table = pg_table
+    feed = ChangeFeed(engine, after=0, batch_size=3, poll_interval=0.5, table=table, channel=f"{table}_changes")
+    batches = collect(feed)
+    feed.start()
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"INSERT INTO {table} (spill_number) SELECT generate_series(1, 7)"))
+        assert wait_for(lambda: feed.delivered == 7)
+        assert [len(b) for b in batches] == [3, 3, 1]
+        assert pd.concat(batches)["spill_number"].tolist() == list(range(1, 8))
+        assert feed.watermark == 7
+    finally:
+        feed.close()
+    assert not any(t.name == "change-feed" and t.is_alive() for t in threading.enumerate())
+
+    # The listener's LISTEN/autocommit session must not come back through the pool
+    conns = [engine.connect() for _ in range(engine.pool.checkedin())]
+    try:
+        for conn in conns:
+            assert conn.execute(text("SELECT count(*) FROM pg_listening_channels()")).scalar() == 0
+            assert conn.connection.dbapi_connection.autocommit is False
+    finally:
+        for conn in conns:
+            conn.close()
@@ -1,17 +1,15 @@
-import os
+import argparse
+import time
+from functools import partial
 import numpy as np
 from stable_baselines3 import DQN
-from stable_baselines3.common.vec_env import DummyVecEnv
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv
 from database_healing_env_realistic_v3 import RealisticDatabaseHealingEnvV3
+from replay_checkpoint import ReplayCheckpointCallback, load_checkpoint, save_checkpoint, seed_from_action_log
 
-# Create environment
-env = DummyVecEnv([lambda: RealisticDatabaseHealingEnvV3()])
 
-# Create DQN agent
-model = DQN(
-    "MlpPolicy",
-    env,
-    verbose=1,
+# DQN settings; sweeps (hyperparam_sweep.py) override individual entries
+HYPERPARAMS = dict(
     learning_rate=1e-4,
     buffer_size=10000,
     learning_starts=1000,
@@ -22,13 +20,134 @@ model = DQN(
     target_update_interval=1000,
     exploration_fraction=0.2,
     exploration_final_eps=0.02,
-    policy_kwargs=dict(net_arch=[256, 256]),
-    tensorboard_log="./tensorboard_logs"
+    net_arch=[256, 256],
 )
 
-# Train the model
-model.learn(total_timesteps=10000)
 
-# Save the model
-model.save("dqn_self_healing_model_realistic_v3")
-print("✅ Model trained and saved.")
+def build_model(env, seed=None, verbose=1, tensorboard_log="./tensorboard_logs", **overrides):
+    params = {**HYPERPARAMS, **overrides}
+    net_arch = params.pop("net_arch")
+    return DQN(
+        "MlpPolicy",
+        env,
+        verbose=verbose,
+        policy_kwargs=dict(net_arch=list(net_arch)),
+        tensorboard_log=tensorboard_log,
+        seed=seed,
+        **params
+    )
+
+
+def make_env(profile=False, storage=None, executor=False):
+    # Called inside the worker process, so each worker opens its own engine after fork
+    env = RealisticDatabaseHealingEnvV3(storage=storage, executor=executor or None)
+    if profile:
+        from training_instrumentation import ProfiledEnv
+        env = ProfiledEnv(env)
+    return env
+
+
+def build_vec_env(num_envs, start_method=None, vectorized=False, profile=False, storage=None, executor=False):
+    if vectorized:
+        # Single-process batched simulator; anomaly flags are loaded once up front
+        from vec_healing_env import VectorizedDatabaseHealingEnv
+        env = VectorizedDatabaseHealingEnv(num_envs, storage=storage)
+        if profile:
+            from training_instrumentation import ProfiledVecEnv
+            env = ProfiledVecEnv(env)
+        return env
+    env_fn = partial(make_env, profile=profile, storage=storage, executor=executor)
+    if num_envs == 1:
+        return DummyVecEnv([env_fn])
+    return SubprocVecEnv([env_fn] * num_envs, start_method=start_method)
+
+
+def measure_step_rate(env, steps):
+    """Random-action env steps per second (summed over all envs)."""
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(steps):
+        actions = np.array([env.action_space.sample() for _ in range(env.num_envs)])
+        env.step(actions)
+    return steps * env.num_envs / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the DQN self-healing agent.")
+    parser.add_argument("--num-envs", type=int, default=1, help="environments, one worker process each when > 1")
+    parser.add_argument("--total-timesteps", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--start-method", default=None, help="multiprocessing start method for SubprocVecEnv")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="run all envs in the batched NumPy simulator instead of worker processes")
+    parser.add_argument("--benchmark-steps", type=int, default=0,
+                        help="measure env step rate against the single-env baseline before training")
+    parser.add_argument("--checkpoint-dir", default=None, help="save model + replay buffer here")
+    parser.add_argument("--checkpoint-freq", type=int, default=0,
+                        help="also checkpoint every N env steps during training (0 = only at the end)")
+    parser.add_argument("--resume", action="store_true", help="continue training from --checkpoint-dir")
+    parser.add_argument("--seed-log", default=None,
+                        help="fill the replay buffer from an agent action log (agent_log.arrow), replacing its contents")
+    parser.add_argument("--storage", default=None,
+                        help="episode storage URL, e.g. sqlite:///stream_buffer.sqlite or "
+                             "arrow:///stream_buffer.parquet (default: $EPISODE_STORAGE_URL or Postgres)")
+    parser.add_argument("--executor", action="store_true",
+                        help="run actions against a Postgres sandbox and observe measured latency/null/duplicate counts")
+    parser.add_argument("--profile", action="store_true",
+                        help="record per-phase timings, DB latency and memory (TensorBoard + Prometheus file)")
+    parser.add_argument("--profile-freq", type=int, default=1000, help="env steps between profile reports")
+    parser.add_argument("--profile-file", default="training_metrics.prom", help="Prometheus text file to write")
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint_dir:
+        parser.error("--resume requires --checkpoint-dir")
+    if args.executor and args.vectorized:
+        parser.error("--executor needs per-env instances; it cannot be combined with --vectorized")
+
+    # Benchmark against the single-env baseline
+    if args.benchmark_steps and args.num_envs > 1:
+        baseline_env = build_vec_env(1, storage=args.storage, executor=args.executor)
+        baseline_rate = measure_step_rate(baseline_env, args.benchmark_steps)
+        baseline_env.close()
+    else:
+        baseline_rate = None
+
+    # Create environment
+    env = build_vec_env(args.num_envs, args.start_method, args.vectorized, profile=args.profile,
+                        storage=args.storage, executor=args.executor)
+
+    if baseline_rate is not None:
+        rate = measure_step_rate(env, args.benchmark_steps)
+        print(f"⏱️  Env step rate: {rate:.0f} steps/s with {args.num_envs} envs "
+              f"vs {baseline_rate:.0f} steps/s single-env ({rate / baseline_rate:.1f}x)")
+
+    # Create DQN agent (or restore it with its replay buffer)
+    if args.resume:
+        model, restored = load_checkpoint(args.checkpoint_dir, env)
+        print(f"♻️  Resumed at {model.num_timesteps} timesteps with {restored} replayed transitions")
+    else:
+        model = build_model(env, seed=args.seed)
+
+    if args.seed_log:
+        seeded = seed_from_action_log(model, args.seed_log)
+        print(f"🌱 Seeded replay buffer with {seeded} logged transitions")
+
+    callback = []
+    if args.checkpoint_dir and args.checkpoint_freq:
+        callback.append(ReplayCheckpointCallback(args.checkpoint_dir, max(1, args.checkpoint_freq // env.num_envs)))
+    if args.profile:
+        from training_instrumentation import TrainingProfiler
+        callback.append(TrainingProfiler(args.profile_freq, args.profile_file))
+
+    # Train the model
+    start = time.perf_counter()
+    model.learn(total_timesteps=args.total_timesteps, reset_num_timesteps=not args.resume, callback=callback)
+    elapsed = time.perf_counter() - start
+    print(f"⏱️  Training throughput: {args.total_timesteps / elapsed:.0f} steps/s with {args.num_envs} envs")
+
+    # Save the model
+    model.save("dqn_self_healing_model_realistic_v3")
+    if args.checkpoint_dir:
+        save_checkpoint(model, args.checkpoint_dir)
+        print(f"💾 Checkpoint (model + replay buffer) saved to {args.checkpoint_dir}")
+    env.close()
+    print("✅ Model trained and saved.")
@@ -0,0 +1,330 @@
+"""
+Script: training_instrumentation.py
+Purpose: Opt-in profiling of the DQN training loop.
+
+- ProfiledEnv (gym wrapper): times every reset()/step() of one env and, when the
+  env samples episodes from Postgres, every DB query its engine runs. It works
+  inside SubprocVecEnv workers too: the callback drains each worker's numbers
+  through `env_method`.
+- ProfiledVecEnv (VecEnv wrapper): the same for the batched simulator, which has
+  no per-env instances. Its step/reset timings are per batched call.
+- TrainingProfiler (SB3 callback): splits wall time into phases. These are env
+  stepping, policy/rollout overhead, replay-buffer sampling and gradient updates.
+  It also tracks steps/s and resident memory for the trainer plus its env workers.
+
+Every `log_freq` env steps the numbers go to the SB3 logger, and so to
+TensorBoard under `profile/`. They are also written as a Prometheus text file
+(node_exporter textfile format) that can be scraped or diffed between runs.
+
+    python train_dqn_agent_realistic_v3.py --profile [--profile-file training_metrics.prom]
+"""
+
+import os
+import resource
+import threading
+import time
+
+import gymnasium as gym
+import numpy as np
+from sqlalchemy import event
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import VecEnvWrapper
+
+PROM_PATH = "training_metrics.prom"
+# Seconds; Prometheus-style cumulative histogram buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def rss_bytes():
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs: fall back to the peak (ru_maxrss is in kilobytes on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = np.zeros(len(self.buckets) + 1, dtype=np.int64)  # last slot: +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[np.searchsorted(self.buckets, seconds)] += 1
+            self.sum += seconds
+
+    def merge(self, state):
+        with self._lock:
+            self.counts += np.asarray(state["counts"], dtype=np.int64)
+            self.sum += state["sum"]
+
+    def drain(self):
+        """Picklable state since the last drain, then reset."""
+        with self._lock:
+            state = {"counts": self.counts.tolist(), "sum": self.sum}
+            self.counts[:] = 0
+            self.sum = 0.0
+        return state
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile `q`."""
+        total = self.count
+        if total == 0:
+            return 0.0
+        idx = int(np.searchsorted(np.cumsum(self.counts), q * total))
+        return self.buckets[idx] if idx < len(self.buckets) else float("inf")
+
+    def prometheus(self, name, labels=""):
+        sep = "," if labels else ""
+        lines, cumulative = [], 0
+        for le, n in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += int(n)
+            lines.append(f'{name}_bucket{{{labels}{sep}le="{le}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {cumulative}")
+        return lines
+
+
+# --- DB QUERY LATENCY ---
+# One histogram per process, fed by every engine a ProfiledEnv has seen
+DB_LATENCY = Histogram()
+_instrumented_engines = set()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_start"] = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    DB_LATENCY.observe(time.perf_counter() - conn.info.pop("query_start"))
+
+
+def instrument_engine(engine):
+    if engine is None or id(engine) in _instrumented_engines:
+        return
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+    _instrumented_engines.add(id(engine))
+
+
+# --- ENV WRAPPER ---
+class ProfiledEnv(gym.Wrapper):
+    """Times reset()/step() of the wrapped env and the DB queries behind its sampler."""
+
+    def __init__(self, env):
+        super().__init__(env)
+        self.reset_time = Histogram()
+        self.step_time = Histogram()
+        sampler = getattr(env.unwrapped, "sampler", None)
+        instrument_engine(getattr(sampler, "engine", None))
+
+    def reset(self, **kwargs):
+        start = time.perf_counter()
+        result = self.env.reset(**kwargs)
+        self.reset_time.observe(time.perf_counter() - start)
+        return result
+
+    def step(self, action):
+        start = time.perf_counter()
+        result = self.env.step(action)
+        self.step_time.observe(time.perf_counter() - start)
+        return result
+
+    def profile_drain(self):
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": rss_bytes(),
+            "reset": self.reset_time.drain(),
+            "step": self.step_time.drain(),
+            "db": DB_LATENCY.drain(),
+        }
+
+
+class ProfiledVecEnv(VecEnvWrapper):
+    """Times reset()/step() of a batched VecEnv (one observation per call, not per env)."""
+
+    def __init__(self, venv):
+        super().__init__(venv)
+        self.reset_time = Histogram()
+        self.step_time = Histogram()
+
+    def reset(self):
+        start = time.perf_counter()
+        obs = self.venv.reset()
+        self.reset_time.observe(time.perf_counter() - start)
+        return obs
+
+    def step_wait(self):
+        start = time.perf_counter()
+        result = self.venv.step_wait()
+        self.step_time.observe(time.perf_counter() - start)
+        return result
+
+    def profile_drain(self):
+        return {
+            "pid": os.getpid(),
+            "rss_bytes": rss_bytes(),
+            "reset": self.reset_time.drain(),
+            "step": self.step_time.drain(),
+            "db": DB_LATENCY.drain(),
+        }
+
+
+# --- CALLBACK ---
+class TrainingProfiler(BaseCallback):
+    """Per-phase timings, steps/s, DB latency and memory, logged every `log_freq` env steps."""
+
+    PHASES = ("env_step", "rollout_other", "replay_sample", "gradient_update")
+
+    def __init__(self, log_freq=1000, prom_path=PROM_PATH, verbose=0):
+        super().__init__(verbose)
+        self.log_freq = log_freq
+        self.prom_path = prom_path
+        self.phase_seconds = dict.fromkeys(self.PHASES, 0.0)
+        self.window_seconds = dict.fromkeys(self.PHASES, 0.0)
+        self.histograms = {"env_reset": Histogram(), "env_step": Histogram(), "db_query": Histogram()}
+        self.worker_rss = {}
+        self._patched = []
+        self._env_profiled = False
+        self._vec_profiled = False
+        self._last_log = 0
+        self._rollout_start = None
+
+    # --- PHASE TIMING ---
+    def _timed(self, phase, fn):
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._add(phase, time.perf_counter() - start)
+        return wrapper
+
+    def _add(self, phase, seconds):
+        self.phase_seconds[phase] += seconds
+        self.window_seconds[phase] += seconds
+
+    def _patch(self, obj, name, phase):
+        original = getattr(obj, name)
+        setattr(obj, name, self._timed(phase, original))
+        self._patched.append((obj, name))
+        return original
+
+    def _on_training_start(self):
+        # Instance attributes shadow the bound methods for the duration of learn()
+        self._patch(self.training_env, "step", "env_step")
+        self._patch(self.model.replay_buffer, "sample", "replay_sample")
+        self._patch(self.model, "train", "gradient_update")
+        # The batched simulator has no per-env instances; it is wrapped as a whole
+        self._vec_profiled = isinstance(self.training_env, ProfiledVecEnv)
+        self._env_profiled = self._vec_profiled or all(self.training_env.env_is_wrapped(ProfiledEnv))
+        self._last_log = self.num_timesteps
+        self._window_start = time.perf_counter()
+
+    def _on_training_end(self):
+        for obj, name in self._patched:
+            delattr(obj, name)
+        self._patched = []
+        if self.num_timesteps > self._last_log:
+            self._log()
+
+    def _on_rollout_start(self):
+        self._rollout_start = time.perf_counter()
+        self._env_at_rollout_start = self.phase_seconds["env_step"]
+
+    def _on_rollout_end(self):
+        if self._rollout_start is not None:
+            rollout = time.perf_counter() - self._rollout_start
+            env = self.phase_seconds["env_step"] - self._env_at_rollout_start
+            self._add("rollout_other", max(0.0, rollout - env))
+
+    def _on_step(self):
+        if self.num_timesteps - self._last_log >= self.log_freq:
+            self._log()
+        return True
+
+    # --- COLLECTION ---
+    def _drain_envs(self):
+        if not self._env_profiled:
+            return
+        if self._vec_profiled:
+            reports = [self.training_env.profile_drain()]
+        else:
+            reports = self.training_env.env_method("profile_drain")
+        for report in reports:
+            self.histograms["env_reset"].merge(report["reset"])
+            self.histograms["env_step"].merge(report["step"])
+            self.histograms["db_query"].merge(report["db"])
+            self.worker_rss[report["pid"]] = report["rss_bytes"]
+
+    def snapshot(self):
+        """Current metrics as a flat dict (also what gets logged)."""
+        elapsed = time.perf_counter() - self._window_start
+        steps = self.num_timesteps - self._last_log
+        # replay sampling happens inside train(); report the update itself without it
+        window = dict(self.window_seconds)
+        window["gradient_update"] = max(0.0, window["gradient_update"] - window["replay_sample"])
+        out = {"steps_per_second": steps / elapsed if elapsed > 0 else 0.0}
+        for phase, seconds in window.items():
+            out[f"{phase}_share"] = seconds / elapsed if elapsed > 0 else 0.0
+        for name, hist in self.histograms.items():
+            out[f"{name}_ms_p50"] = hist.quantile(0.5) * 1000
+            out[f"{name}_ms_p99"] = hist.quantile(0.99) * 1000
+            out[f"{name}_count"] = hist.count
+        out["trainer_rss_mb"] = rss_bytes() / 2**20
+        out["worker_rss_mb"] = sum(rss for pid, rss in self.worker_rss.items() if pid != os.getpid()) / 2**20
+        return out
+
+    def _log(self):
+        self._drain_envs()
+        for key, value in self.snapshot().items():
+            self.logger.record(f"profile/{key}", value)
+        self.logger.dump(self.num_timesteps)
+        if self.prom_path:
+            self.write_prometheus(self.prom_path)
+        self._last_log = self.num_timesteps
+        self._window_start = time.perf_counter()
+        self.window_seconds = dict.fromkeys(self.PHASES, 0.0)
+
+    # --- PROMETHEUS ---
+    def write_prometheus(self, path):
+        totals = dict(self.phase_seconds)
+        totals["gradient_update"] = max(0.0, totals["gradient_update"] - totals["replay_sample"])
+        snap = self.snapshot()
+        lines = [
+            "# HELP rl_train_timesteps_total Environment steps taken by the learner.",
+            "# TYPE rl_train_timesteps_total counter",
+            f"rl_train_timesteps_total {self.num_timesteps}",
+            "# HELP rl_train_steps_per_second Environment steps per second over the last window.",
+            "# TYPE rl_train_steps_per_second gauge",
+            f"rl_train_steps_per_second {snap['steps_per_second']:.3f}",
+            "# HELP rl_train_phase_seconds_total Wall time spent per training phase.",
+            "# TYPE rl_train_phase_seconds_total counter",
+        ]
+        lines += [f'rl_train_phase_seconds_total{{phase="{p}"}} {s:.6f}' for p, s in totals.items()]
+        for name, help_text in (("env_reset", "Env reset() latency, including episode sampling."),
+                                ("env_step", "Env step() latency."),
+                                ("db_query", "Latency of DB queries issued by the envs.")):
+            metric = f"rl_{name}_seconds"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} histogram"]
+            lines += self.histograms[name].prometheus(metric)
+        lines += [
+            "# HELP rl_train_resident_memory_bytes Resident memory of the trainer and its env workers.",
+            "# TYPE rl_train_resident_memory_bytes gauge",
+            f'rl_train_resident_memory_bytes{{process="trainer"}} {rss_bytes()}',
+            f'rl_train_resident_memory_bytes{{process="workers"}} '
+            f'{sum(rss for pid, rss in self.worker_rss.items() if pid != os.getpid())}',
+        ]
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, path)
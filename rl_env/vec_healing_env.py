@@ -0,0 +1,76 @@
+"""
+Script: vec_healing_env.py
+Purpose: Stable-Baselines3 `VecEnv` adapter for the batched healing simulator.
+
+`VectorizedDatabaseHealingEnv` exposes `BatchedHealingSimulator` (healing_simulator.py)
+through the SB3 `VecEnv` interface so it can replace
+`DummyVecEnv([lambda: RealisticDatabaseHealingEnvV3()])` directly in training.
+Consumers that only run a policy should use the simulator itself, which does not
+import stable_baselines3/torch.
+
+Simulator attributes (`step_info`, `max_steps`, `reset_with_flags`, ...) are
+reachable on the adapter as well.
+"""
+
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from healing_simulator import BatchedHealingSimulator
+
+
+class VectorizedDatabaseHealingEnv(VecEnv):
+    render_mode = None
+
+    def __init__(self, num_envs=1024, anomaly_flags=None, max_steps=30, seed=None, storage=None):
+        self.sim = BatchedHealingSimulator(num_envs, anomaly_flags, max_steps, seed, storage)
+        super().__init__(num_envs, self.sim.observation_space, self.sim.action_space)
+        self._actions = None
+
+    def __getattr__(self, name):
+        # Only called for attributes the adapter itself lacks
+        if name == "sim":
+            raise AttributeError(name)
+        return getattr(self.sim, name)
+
+    def reset(self):
+        if self._seeds[0] is not None:
+            self.sim.seed(self._seeds[0])
+        obs = self.sim.reset()
+        self._reset_seeds()
+        self._reset_options()
+        return obs
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def step_wait(self):
+        return self.sim.step(self._actions)
+
+    # --- VecEnv PLUMBING ---
+    def close(self):
+        self.sim.close()
+
+    def get_attr(self, attr_name, indices=None):
+        value = getattr(self, attr_name)  # the adapter's own, else the simulator's
+        indices = list(self._get_indices(indices))
+        if isinstance(value, np.ndarray) and value.shape[:1] == (self.num_envs,):
+            return [value[i] for i in indices]
+        return [value for _ in indices]
+
+    def set_attr(self, attr_name, value, indices=None):
+        current = getattr(self.sim, attr_name, None)
+        if isinstance(current, np.ndarray) and current.shape[:1] == (self.num_envs,):
+            current[list(self._get_indices(indices))] = value
+        else:
+            setattr(self.sim if hasattr(self.sim, attr_name) else self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        """Call `method_name` once on the batched simulator; its result is repeated for every index.
+
+        There are no per-env instances, so a method acts on all envs at once.
+        """
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
@@ -1,7 +1,7 @@
 
 """
 Script: visualize_agent_log.py
-Purpose: Visualize agent behavior from `agent_log.csv` using matplotlib and pandas.
+Purpose: Visualize agent behavior from the action log (`agent_log.arrow`) using matplotlib and pandas.
 
 Creates:
 - Cumulative reward line chart
@@ -11,12 +11,12 @@ Creates:
 Author: Khondaker Zahin Fuad
 """
 
-import pandas as pd
 import matplotlib.pyplot as plt
+from action_log import read_action_log
 
 # --- Load Log ---
-log_path = "./agent_log.csv"
-df = pd.read_csv(log_path)
+log_path = "./agent_log.arrow"
+df = read_action_log(log_path)
 
 # --- Cumulative Reward Plot ---
 df["cumulative_reward"] = df["reward"].cumsum()
@@ -41,17 +41,10 @@ plt.savefig("action_distribution.png")
 plt.close()
 
 # --- State Trends (Optional Subplots) ---
-states = df["state"].apply(eval).tolist()
-state_df = pd.DataFrame(states, columns=[
-    "missing_pct", "anomaly_count", "query_latency",
-    "act1", "act2", "act3", "act4", "act5"
-])
-state_df["timestamp"] = df["timestamp"]
-
 plt.figure(figsize=(10, 6))
-plt.plot(state_df["timestamp"], state_df["missing_pct"], label="Missing %")
-plt.plot(state_df["timestamp"], state_df["anomaly_count"], label="Anomaly Count")
-plt.plot(state_df["timestamp"], state_df["query_latency"], label="Latency")
+plt.plot(df["timestamp"], df["missing_pct"], label="Missing %")
+plt.plot(df["timestamp"], df["anomaly_count"], label="Anomaly Count")
+plt.plot(df["timestamp"], df["query_latency"], label="Latency")
 plt.xticks(rotation=45)
 plt.title("Key State Metrics Over Time")
 plt.xlabel("Time")